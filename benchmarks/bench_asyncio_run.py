@@ -0,0 +1,30 @@
+"""
+Benchmark the calls per second of a trivial async function made sync by `asyncio_run()`,
+comparing the modes.
+
+Run with `python -m benchmarks.bench_asyncio_run` from the root of the repository.
+"""
+
+import timeit
+
+from recipes.asyncio import asyncio_run
+
+
+NUMBER = 2_000
+REPEAT = 5
+
+
+async def trivial() -> None:
+    pass
+
+
+def main() -> None:
+
+    for mode in ["run", "runner", "thread"]:
+        func = asyncio_run(mode=mode)(trivial)  # type: ignore
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=REPEAT))
+        print(f"mode={mode!r:<10} {NUMBER / seconds:>10,.0f} calls per second")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark reading many small files asynchronously, one `asyncio.to_thread()` job per
+file, one I/O executor job per file with `aread_text()`, and batched jobs with
+`aread_texts()`.
+
+Run with `python -m benchmarks.bench_file_io` from the root of the repository.
+"""
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from recipes.asyncio import aread_text, aread_texts, awrite_texts
+from recipes.builtins import read_text
+
+
+NFILES = 2_000
+REPEAT = 5
+
+
+async def per_file_to_thread(files: list[Path]) -> None:
+    await asyncio.gather(*(asyncio.to_thread(read_text, file) for file in files))
+
+
+async def per_file_executor(files: list[Path]) -> None:
+    await asyncio.gather(*(aread_text(file) for file in files))
+
+
+async def batched_executor(files: list[Path]) -> None:
+    await aread_texts(files)
+
+
+def main() -> None:
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = [Path(tmpdir, f"{i}.txt") for i in range(NFILES)]
+        asyncio.run(awrite_texts({file: "x" * 100 for file in files}))
+
+        for label, coro_func in [
+            ("to_thread() per file", per_file_to_thread),
+            ("aread_text() per file", per_file_executor),
+            ("aread_texts()", batched_executor),
+        ]:
+            timings = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                asyncio.run(coro_func(files))
+                timings.append(time.perf_counter() - start)
+            print(f"{label:<24} {NFILES / min(timings):>10,.0f} files per second")
+
+
+if __name__ == "__main__":
+    main()
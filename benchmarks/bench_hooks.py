@@ -0,0 +1,66 @@
+"""
+Benchmark the call overhead of functions with 0, 1 and 10 hooks, comparing the fused
+hook chains of `inject_pre_hook()` against stacked `functools.wraps` wrappers.
+
+Run with `python -m benchmarks.bench_hooks` from the root of the repository.
+"""
+
+import timeit
+from functools import wraps
+
+from recipes.functools import get_hooks, hookable, inject_pre_hook, noop
+
+
+NUMBER = 200_000
+REPEAT = 5
+
+
+def stacked_inject_pre_hook(prehook, func):
+    """The previous implementation, which adds a wrapper layer per hook"""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        prehook(*args, **kwargs)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def func(x: int) -> int:
+    return x
+
+
+@wraps(func)
+def passthrough(*args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def report(label: str, call) -> None:
+    seconds = min(timeit.repeat(call, number=NUMBER, repeat=REPEAT))
+    print(f"{label:<28} {seconds / NUMBER * 1e9:>8.1f} ns per call")
+
+
+def main() -> None:
+
+    report("direct call", lambda: func(1))
+    report("pass-through wrapper", lambda: passthrough(1))
+
+    disabled = hookable(func)
+    get_hooks(disabled).add_pre_hook(noop)
+    get_hooks(disabled).disable()
+    report("disabled hook set", lambda: disabled(1))
+
+    for count in [0, 1, 10]:
+        fused = stacked = func
+        if count == 0:
+            fused = hookable(func)
+        for _ in range(count):
+            fused = inject_pre_hook(noop, fused)
+            stacked = stacked_inject_pre_hook(noop, stacked)
+
+        report(f"fused, {count} hooks", lambda: fused(1))
+        report(f"stacked, {count} hooks", lambda: stacked(1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark the attribute access cost on lazily imported modules, comparing the
+`LazyLoader`-based `lazy_import_module()` against a `lazy_object_proxy.Proxy` wrapping
+`importlib.import_module()`.
+
+Run with `python -m benchmarks.bench_importlib` from the root of the repository.
+"""
+
+import importlib
+import timeit
+
+from lazy_object_proxy import Proxy
+
+from recipes.importlib import lazy_import_module
+
+
+NUMBER = 1_000_000
+
+
+def main() -> None:
+
+    lazy_module = lazy_import_module("fractions")
+    proxy_module = Proxy(lambda: importlib.import_module("fractions"))
+    plain_module = importlib.import_module("fractions")
+
+    # Trigger the actual imports
+    lazy_module.Fraction
+    proxy_module.Fraction
+
+    for label, module in [
+        ("plain module", plain_module),
+        ("lazy_import_module()", lazy_module),
+        ("Proxy", proxy_module),
+    ]:
+        seconds = timeit.timeit("module.Fraction", globals=locals(), number=NUMBER)
+        print(f"{label:<24} {seconds / NUMBER * 1e9:>8.1f} ns per attribute access")
+
+
+if __name__ == "__main__":
+    main()
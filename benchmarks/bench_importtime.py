@@ -0,0 +1,44 @@
+"""
+Benchmark the import time of each `recipes` submodule.
+
+Run with `python -m benchmarks.bench_importtime` from the root of the repository.
+"""
+
+import pkgutil
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROUNDS = 5
+
+
+def import_time(module: str) -> int:
+    """Return the cumulative import time of the module in microseconds"""
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # The last line is the module itself, as it finishes importing last
+    _, cumulative, name = proc.stderr.splitlines()[-1].split("|")
+    assert name.strip() == module
+    return int(cumulative)
+
+
+def main() -> None:
+
+    package_path = Path(__file__).parent.parent / "recipes"
+
+    for module_info in pkgutil.iter_modules([str(package_path)]):
+        module = f"recipes.{module_info.name}"
+        median = statistics.median(import_time(module) for _ in range(ROUNDS))
+        print(f"{module:<24} {median / 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
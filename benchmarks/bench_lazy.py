@@ -0,0 +1,44 @@
+"""
+Benchmark the access cost of lazy values after evaluation, comparing `Lazy` against the
+`lazy_object_proxy.Proxy` returned by `lazy_call()`.
+
+Run with `python -m benchmarks.bench_lazy` from the root of the repository.
+"""
+
+import timeit
+
+from recipes.functools import Lazy, force, lazy_call
+
+
+NUMBER = 500_000
+REPEAT = 5
+
+
+class Point:
+    def __init__(self) -> None:
+        self.x = 1
+
+
+def report(label: str, stmt: str, namespace: dict) -> None:
+    seconds = min(timeit.repeat(stmt, globals=namespace, number=NUMBER, repeat=REPEAT))
+    print(f"{label:<28} {seconds / NUMBER * 1e9:>8.1f} ns per access")
+
+
+def main() -> None:
+
+    proxy = lazy_call(Point)
+    lazy = Lazy(Point)
+
+    # Trigger the evaluations
+    proxy.x
+    lazy.get()
+
+    namespace = {"proxy": proxy, "lazy": lazy, "plain": force(proxy)}
+
+    report("plain value", "plain.x", namespace)
+    report("Lazy.get()", "lazy.get().x", namespace)
+    report("lazy_call() proxy", "proxy.x", namespace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark the event loop health metrics reported by `LoopMonitor` under a workload of
+many concurrent tasks, comparing the default event loop with uvloop, if installed.
+
+Run with `python -m benchmarks.bench_loop_monitor` from the root of the repository.
+"""
+
+import asyncio
+import statistics
+import time
+from collections.abc import Callable
+
+from recipes.asyncio import LoopMonitor
+
+
+NTASKS = 2_000
+NSTEPS = 50
+
+
+async def worker() -> None:
+    for _ in range(NSTEPS):
+        sum(range(100))
+        await asyncio.sleep(0)
+
+
+async def workload() -> LoopMonitor:
+    async with LoopMonitor(interval=0.005, threshold=0.05) as monitor:
+        await asyncio.gather(*(worker() for _ in range(NTASKS)))
+    return monitor
+
+
+def report(label: str, loop_factory: Callable[[], asyncio.AbstractEventLoop]) -> None:
+
+    start = time.perf_counter()
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        monitor = runner.run(workload())
+    seconds = time.perf_counter() - start
+
+    lags = [event.value * 1e3 for event in monitor.events if event.kind == "lag"]
+    slow = sum(event.kind == "slow_callback" for event in monitor.events)
+    print(
+        f"{label:<10} {seconds:>6.2f} s total, "
+        f"lag mean {statistics.mean(lags):.2f} ms, max {max(lags):.2f} ms, "
+        f"{slow} slow callbacks"
+    )
+
+
+def main() -> None:
+
+    report("asyncio", asyncio.new_event_loop)
+
+    try:
+        import uvloop  # type: ignore
+    except ImportError:
+        print(f"{'uvloop':<10} not installed")
+    else:
+        report("uvloop", uvloop.new_event_loop)
+
+
+if __name__ == "__main__":
+    main()
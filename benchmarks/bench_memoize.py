@@ -0,0 +1,36 @@
+"""
+Benchmark the overhead per cache hit of `memoize()`, comparing against
+`functools.lru_cache`.
+
+Run with `python -m benchmarks.bench_memoize` from the root of the repository.
+"""
+
+import functools
+import timeit
+
+from recipes.functools import memoize
+
+
+NUMBER = 200_000
+
+
+def main() -> None:
+    def func(x: int, y: int = 0) -> int:
+        return x + y
+
+    candidates = [
+        ("lru_cache", functools.lru_cache(maxsize=128)(func)),
+        ("memoize lru", memoize(maxsize=128)(func)),
+        ("memoize lfu", memoize(maxsize=128, policy="lfu")(func)),
+        ("memoize lru ttl", memoize(maxsize=128, ttl=60)(func)),
+        ("memoize lru maxbytes", memoize(maxsize=None, maxbytes=1 << 20)(func)),
+    ]
+
+    for label, cached in candidates:
+        cached(1, y=2)  # Warm up the cache
+        seconds = timeit.timeit(lambda: cached(1, y=2), number=NUMBER)
+        print(f"{label:<24} {seconds / NUMBER * 1e9:>8.1f} ns per hit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark applying 1, 5 and 20 transformer passes to a module, comparing a
+`transform_source()` call per pass, a `transform_source_pipeline()` parsing and
+serializing once, and, for the `cst` flavor, a fused pipeline traversing the tree once.
+
+Run with `python -m benchmarks.bench_pipeline` from the root of the repository.
+"""
+
+import ast
+import time
+from collections.abc import Callable
+from pathlib import Path
+from types import ModuleType
+
+import libcst as cst
+
+from recipes import ast as ast_recipes, cst as cst_recipes
+
+
+SOURCE = Path(__file__).parent.parent.joinpath("recipes", "monoids.py").read_text()
+PASSES = [1, 5, 20]
+REPEAT = 3
+
+
+class AstRename(ast.NodeTransformer):
+    def __init__(self, index: int) -> None:
+        self.old = f"name_{index}"
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        if node.id == self.old:
+            node.id += "_renamed"
+        return node
+
+
+class CstRename(cst.CSTTransformer):
+    def __init__(self, index: int) -> None:
+        self.old = f"name_{index}"
+
+    def leave_Name(self, original_node: cst.Name, updated_node: cst.Name) -> cst.Name:
+        if updated_node.value == self.old:
+            return updated_node.with_changes(value=self.old + "_renamed")
+        return updated_node
+
+
+def measure(func: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(
+    flavor: str, recipes: ModuleType, transformer_type: type, fusable: bool
+) -> None:
+
+    for npasses in PASSES:
+        transformers = [transformer_type(index) for index in range(npasses)]
+
+        def per_pass() -> str:
+            source = SOURCE
+            for transformer in transformers:
+                source = recipes.transform_source(transformer, source)
+            return source
+
+        def pipeline() -> str:
+            return recipes.transform_source_pipeline(transformers, SOURCE)
+
+        def fused() -> str:
+            return recipes.transform_source_pipeline(transformers, SOURCE, fuse=True)
+
+        variants = [("per pass", per_pass), ("pipeline", pipeline)]
+        if fusable:
+            variants.append(("fused", fused))
+        timings = ", ".join(
+            f"{label} {measure(func) * 1e3:>8.1f} ms" for label, func in variants
+        )
+        print(f"{flavor} {npasses:>2} passes: {timings}")
+
+
+def main() -> None:
+    report("ast", ast_recipes, AstRename, fusable=False)
+    report("cst", cst_recipes, CstRename, fusable=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark the throughput of running many short-lived `true` and `cat` processes, one by
+one with `asyncio_subprocess_check_output()`, and concurrently with `SubprocessPool`.
+
+Run with `python -m benchmarks.bench_subprocess_pool` from the root of the repository.
+"""
+
+import asyncio
+import time
+from functools import partial
+
+from recipes.asyncio import SubprocessPool, asyncio_subprocess_check_output
+
+
+NCOMMANDS = 200
+
+COMMANDS = {
+    "true": [["true"]] * NCOMMANDS,
+    "cat": [["cat", __file__]] * NCOMMANDS,
+}
+
+
+async def sequential(commands: list[list[str]]) -> None:
+    for args in commands:
+        await asyncio_subprocess_check_output(args)
+
+
+async def pooled(commands: list[list[str]], max_workers: int | None) -> None:
+    await SubprocessPool(max_workers).map(commands)
+
+
+def report(label: str, coro_func, commands: list[list[str]]) -> None:
+    start = time.perf_counter()
+    asyncio.run(coro_func(commands))
+    seconds = time.perf_counter() - start
+    print(f"{label:<32} {len(commands) / seconds:>8,.0f} processes per second")
+
+
+def main() -> None:
+
+    for name, commands in COMMANDS.items():
+        report(f"{name}: sequential", sequential, commands)
+        for max_workers in [None, 8, 32]:
+            label = f"{name}: pool(max_workers={max_workers})"
+            report(label, partial(pooled, max_workers=max_workers), commands)
+
+
+if __name__ == "__main__":
+    main()
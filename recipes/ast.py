@@ -1,7 +1,8 @@
 import ast
+from collections.abc import Sequence
 
 
-__all__ = ["transform_source"]
+__all__ = ["transform_source", "transform_source_pipeline"]
 
 
 def transform_source(transformer: ast.NodeTransformer, source: str) -> str:
@@ -17,3 +18,25 @@ def transform_source(transformer: ast.NodeTransformer, source: str) -> str:
     new_syntax_tree = transformer.visit(syntax_tree)
     new_source = ast.unparse(ast.fix_missing_locations(new_syntax_tree))
     return new_source
+
+
+def transform_source_pipeline(
+    transformers: Sequence[ast.NodeTransformer], source: str
+) -> str:
+    """
+    Transform the source code with the node transformers in order, like calling
+    `transform_source()` for each of them, but parse the source code only once, and
+    unparse it only once at the end.
+
+    Unlike the `cst` flavor, the transformers are not fused into a single traversal.
+    Node transformers drive the traversal themselves, by calling `generic_visit()` or
+    `visit()` on whichever nodes they like, which can't be soundly interleaved. Besides,
+    the traversals are cheap compared to parsing and unparsing.
+    """
+
+    syntax_tree = ast.parse(source)
+
+    for transformer in transformers:
+        syntax_tree = transformer.visit(syntax_tree)
+
+    return ast.unparse(ast.fix_missing_locations(syntax_tree))
@@ -1,12 +1,46 @@
 from __future__ import annotations  # for types imported from _typeshed
 
 import asyncio
-from collections.abc import Awaitable, Callable, Sequence
-from functools import wraps
-from subprocess import CalledProcessError
-from typing import TYPE_CHECKING, TypeVar, ParamSpec
+import atexit
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Hashable,
+    Iterable,
+    Mapping,
+    Sequence,
+)
+from contextlib import AsyncExitStack
+from functools import cache, partial, wraps
+from inspect import iscoroutinefunction
+from subprocess import CalledProcessError, TimeoutExpired
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Generator,
+    Generic,
+    Literal,
+    NamedTuple,
+    Protocol,
+    TypeVar,
+    ParamSpec,
+    overload,
+)
 
-from .builtins import read_text, write_text
+from .builtins import call_at_thread_exit, read_text, write_text
+from .functools import make_key
 
 
 if TYPE_CHECKING:
@@ -15,28 +49,64 @@ if TYPE_CHECKING:
 
 __all__ = [
     "asyncio_subprocess_check_output",
+    "asyncio_subprocess_stream",
+    "SubprocessPool",
     "aread_text",
     "awrite_text",
+    "aread_texts",
+    "awrite_texts",
+    "aread_chunks",
     "asyncio_run",
     "maybe_install_uvloop",
+    "asingleflight",
+    "amap",
+    "as_completed_map",
+    "BatchLoader",
+    "ThreadBatchLoader",
+    "LoopEvent",
+    "LoopMonitor",
+    "TokenBucket",
+    "SlidingWindowLimit",
+    "CompositeLimit",
+    "RateLimiter",
 ]
 
 
 P = ParamSpec("P")
 R = TypeVar("R")
+T = TypeVar("T")
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
 
 
 async def asyncio_subprocess_check_output(
-    args: Sequence[StrOrBytesPath], redirect_stderr_to_stdout: bool = False
+    args: Sequence[StrOrBytesPath],
+    redirect_stderr_to_stdout: bool = False,
+    *,
+    timeout: float | None = None,
 ) -> bytes:
-    """Augment `subprocess.check_output()` with async support"""
+    """
+    Augment `subprocess.check_output()` with async support.
+
+    If the process doesn't complete within `timeout` seconds, it's killed, and
+    `TimeoutExpired` is raised. The process is also killed if the call is cancelled.
+    """
 
     proc = await asyncio.create_subprocess_exec(
         *args,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.STDOUT if redirect_stderr_to_stdout else None,
     )
-    stdout, stderr = await proc.communicate()
+
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutExpired(args, timeout) from None  # type: ignore
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
 
     retcode = proc.returncode
     assert retcode is not None
@@ -47,6 +117,219 @@ async def asyncio_subprocess_check_output(
     return stdout
 
 
+async def asyncio_subprocess_stream(
+    args: Sequence[StrOrBytesPath],
+    redirect_stderr_to_stdout: bool = False,
+    *,
+    lines: bool = False,
+    chunk_size: int = 2**16,
+    limit: int = 2**16,
+    tee: StrPath | BinaryIO | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Streaming version of `asyncio_subprocess_check_output()`, which yields the output
+    in chunks of at most `chunk_size` bytes, or line by line if `lines` is true, instead
+    of accumulating it in memory.
+
+    `limit` is the high-water mark of the output buffered from the process. Once it's
+    exceeded, reading from the pipe is paused until the consumer catches up, so the
+    process blocks on writing. In line mode, a line longer than `limit` raises
+    `ValueError`. If `tee` is specified, the output is also written to it, as a file
+    path or a binary file object.
+
+    `CalledProcessError` is raised at the end of the stream if the process exits with a
+    non-zero code. The process is killed if the iteration stops early.
+
+    Usage:
+
+        ```
+        async for line in asyncio_subprocess_stream(["git", "log"], lines=True):
+            ...
+        ```
+    """
+
+    async with AsyncExitStack() as stack:
+
+        # Open the file before spawning the process, which would otherwise be orphaned
+        # if the file can't be opened
+        if tee is not None and not hasattr(tee, "write"):
+            tee = await run_io(open, tee, "wb")
+            stack.push_async_callback(run_io, tee.close)  # type: ignore
+
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT if redirect_stderr_to_stdout else None,
+            limit=limit,
+        )
+        stdout = proc.stdout
+        assert stdout is not None
+
+        try:
+            while True:
+                if lines:
+                    chunk = await stdout.readline()
+                else:
+                    chunk = await stdout.read(chunk_size)
+                if not chunk:
+                    break
+                if tee is not None:
+                    await run_io(tee.write, chunk)  # type: ignore
+                yield chunk
+
+            retcode = await proc.wait()
+
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                # Drain the pipe, as reading may have been paused, in which case the
+                # end of the pipe is never noticed, and `proc.wait()` never returns.
+                while await stdout.read(chunk_size):
+                    pass
+                await proc.wait()
+
+    if retcode != 0:
+        raise CalledProcessError(retcode, args)
+
+
+# File I/O runs in its own executor, so that it doesn't starve other users of the
+# default executor, such as `asyncio.to_thread()`, and vice versa.
+IO_EXECUTOR_MAX_WORKERS = 8
+
+
+@cache
+def io_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Return the executor dedicated to file I/O, creating it on first use"""
+
+    return concurrent.futures.ThreadPoolExecutor(
+        IO_EXECUTOR_MAX_WORKERS, thread_name_prefix="recipes-io"
+    )
+
+
+async def run_io(func: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
+    """Run the function in the I/O executor"""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor(), partial(func, *args, **kwargs))
+
+
+def available_cpu_count() -> int:
+    """Return the number of CPUs the current process is allowed to run on"""
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class SubprocessPool:
+    """
+    Run many commands concurrently with `asyncio_subprocess_check_output()`, with at
+    most `max_workers` processes at a time, defaulting to the number of available CPUs.
+
+    Each command is killed if it doesn't complete within `timeout` seconds. Failed
+    commands don't abort the others. Their exceptions, `CalledProcessError` or
+    `TimeoutExpired`, are collected and raised together in an `ExceptionGroup` after all
+    the commands complete.
+
+    Usage:
+
+        ```
+        pool = SubprocessPool(timeout=10)
+
+        async for index, output in pool.as_completed(commands):
+            ...
+
+        outputs = await pool.map(commands)
+        ```
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        *,
+        timeout: float | None = None,
+        redirect_stderr_to_stdout: bool = False,
+    ) -> None:
+
+        if max_workers is None:
+            max_workers = available_cpu_count()
+        if max_workers < 1:
+            raise ValueError("max_workers should be a positive integer")
+
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.redirect_stderr_to_stdout = redirect_stderr_to_stdout
+        # A semaphore is bound to the event loop it's first used in, hence one per loop
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            return self._semaphores[loop]
+        except KeyError:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_workers)
+            return semaphore
+
+    async def check_output(self, args: Sequence[StrOrBytesPath]) -> bytes:
+        """Run a command once a worker slot is available, and return its output"""
+
+        async with self._semaphore():
+            return await asyncio_subprocess_check_output(
+                args, self.redirect_stderr_to_stdout, timeout=self.timeout
+            )
+
+    async def as_completed(
+        self, commands: Iterable[Sequence[StrOrBytesPath]]
+    ) -> AsyncIterator[tuple[int, bytes]]:
+        """
+        Run the commands, and yield the index and output of each successful command as
+        soon as it completes. Closing the iterator early kills the running processes.
+        """
+
+        tasks = {
+            asyncio.ensure_future(self.check_output(args)): index
+            for index, args in enumerate(commands)
+        }
+        pending = set(tasks)
+        errors: list[Exception] = []
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in sorted(done, key=tasks.__getitem__):
+                    exc = task.exception()
+                    if exc is not None:
+                        errors.append(exc)  # type: ignore
+                    else:
+                        yield tasks[task], task.result()
+
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if errors:
+            message = f"{len(errors)} of {len(tasks)} commands failed"
+            raise ExceptionGroup(message, errors)
+
+    async def map(self, commands: Iterable[Sequence[StrOrBytesPath]]) -> list[bytes]:
+        """Run the commands, and return their outputs in the order of the commands"""
+
+        commands = list(commands)
+        outputs: list[bytes] = [b""] * len(commands)
+
+        async for index, output in self.as_completed(commands):
+            outputs[index] = output
+
+        return outputs
+
+
 async def aread_text(file: StrPath, encoding: str = "utf-8") -> str:
     """
     Asynchronously read text in UTF-8 encoding.
@@ -57,7 +340,7 @@ async def aread_text(file: StrPath, encoding: str = "utf-8") -> str:
     `locale.getpreferredencoding()` doesn't return "UTF-8".
     """
 
-    return await asyncio.to_thread(read_text, file, encoding)
+    return await run_io(read_text, file, encoding)
 
 
 async def awrite_text(file: StrPath, text: str, encoding: str = "utf-8") -> None:
@@ -70,15 +353,237 @@ async def awrite_text(file: StrPath, text: str, encoding: str = "utf-8") -> None
     `locale.getpreferredencoding()` doesn't return "UTF-8".
     """
 
-    return await asyncio.to_thread(write_text, file, text, encoding)
+    return await run_io(write_text, file, text, encoding)
+
+
+def batched(seq: Sequence[T], size: int) -> list[Sequence[T]]:
+    return [seq[i : i + size] for i in range(0, len(seq), size)]
+
+
+def read_texts(files: Sequence[StrPath], encoding: str) -> list[str]:
+    return [read_text(file, encoding) for file in files]
+
+
+def write_texts(items: Sequence[tuple[StrPath, str]], encoding: str) -> None:
+    for file, text in items:
+        write_text(file, text, encoding)
+
+
+async def aread_texts(
+    files: Iterable[StrPath], encoding: str = "utf-8", *, batch_size: int = 64
+) -> list[str]:
+    """
+    Bulk version of `aread_text()`, which reads the files in batches of `batch_size`,
+    each batch as one job of the I/O executor, to amortize the hand-off overhead.
+    """
+
+    batches = batched(list(files), batch_size)
+    results = await asyncio.gather(
+        *(run_io(read_texts, batch, encoding) for batch in batches)
+    )
+    return [text for texts in results for text in texts]
+
+
+async def awrite_texts(
+    texts: Mapping[StrPath, str], encoding: str = "utf-8", *, batch_size: int = 64
+) -> None:
+    """
+    Bulk version of `awrite_text()`, which writes the files in batches of
+    `batch_size`, each batch as one job of the I/O executor, to amortize the hand-off
+    overhead.
+    """
+
+    batches = batched(list(texts.items()), batch_size)
+    await asyncio.gather(*(run_io(write_texts, batch, encoding) for batch in batches))
+
+
+async def aread_chunks(file: StrPath, chunk_size: int = 2**20) -> AsyncIterator[bytes]:
+    """
+    Asynchronously read a file in binary chunks of at most `chunk_size` bytes, so that
+    large files are processed without being loaded into memory as a whole.
+    """
+
+    f = await run_io(open, file, "rb")
+
+    try:
+        while chunk := await run_io(f.read, chunk_size):
+            yield chunk
+    finally:
+        await run_io(f.close)
+
+
+class ThreadRunners:
+    """
+    Long-lived `asyncio.Runner`s, one per thread, which are closed when their thread
+    ends, or at exit.
+
+    Each thread reuses its own event loop across calls, so calls from multiple threads
+    run concurrently without synchronization.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._runners: set[asyncio.Runner] = set()
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def run(self, coro: Coroutine[Any, Any, R]) -> R:
 
+        try:
+            runner = self._local.runner
+        except AttributeError:
+            runner = self._local.runner = asyncio.Runner()
+            call_at_thread_exit(self._discard, runner)
+            with self._lock:
+                if not self._registered:
+                    atexit.register(self.close)
+                    self._registered = True
+                self._runners.add(runner)
 
-def asyncio_run(func: Callable[P, Awaitable[R]]) -> Callable[P, R]:
-    """Make an async function sync, by wrapping it inside `asyncio.run()` call"""
+        return runner.run(coro)
+
+    def _discard(self, runner: asyncio.Runner) -> None:
+        """Close the runner of an ended thread"""
+
+        with self._lock:
+            self._runners.discard(runner)
+
+        runner.close()
+
+    def close(self) -> None:
+        """Close the runners of all live threads"""
+
+        with self._lock:
+            runners, self._runners = self._runners, set()
+
+        for runner in runners:
+            runner.close()
+
+
+class LoopThread:
+    """
+    An event loop running forever in a daemon thread, which is started on first use and
+    stopped at exit. Calls from any thread are submitted to this loop.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the event loop, starting the thread if not yet started"""
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=self._run_forever,
+                    args=(loop,),
+                    name="LoopThread",
+                    daemon=True,
+                )
+                thread.start()
+                atexit.register(self.close)
+                self._loop, self._thread = loop, thread
+
+            return self._loop
+
+    @staticmethod
+    def _run_forever(loop: asyncio.AbstractEventLoop) -> None:
+
+        asyncio.set_event_loop(loop)
+
+        try:
+            loop.run_forever()
+        finally:
+            try:
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.run_until_complete(loop.shutdown_default_executor())
+            finally:
+                asyncio.set_event_loop(None)
+                loop.close()
+
+    def run(self, coro: Coroutine[Any, Any, R]) -> R:
+
+        loop = self.loop()
+
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("can't block on the loop thread from the loop thread")
+
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def close(self) -> None:
+        """Stop the event loop and wait for the thread to exit"""
+
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+
+        if loop is not None and thread is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+
+
+THREAD_RUNNERS = ThreadRunners()
+LOOP_THREAD = LoopThread()
+
+RUN_MODES: dict[str, Callable[[Coroutine[Any, Any, Any]], Any]] = {
+    "run": asyncio.run,
+    "runner": THREAD_RUNNERS.run,
+    "thread": LOOP_THREAD.run,
+}
+
+
+@overload
+def asyncio_run(
+    func: None = None, *, mode: Literal["run", "runner", "thread"] = "run"
+) -> Callable[[Callable[P, Coroutine[Any, Any, R]]], Callable[P, R]]:
+    ...
+
+
+@overload
+def asyncio_run(func: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, R]:
+    ...
+
+
+def asyncio_run(
+    func: Callable[P, Coroutine[Any, Any, R]] | None = None,
+    *,
+    mode: Literal["run", "runner", "thread"] = "run",
+) -> Callable[P, R] | Callable[[Callable[P, Coroutine[Any, Any, R]]], Callable[P, R]]:
+    """
+    Make an async function sync, by running it to completion on an event loop.
+
+    With `mode="run"` (the default), each call is wrapped inside `asyncio.run()`, which
+    creates and tears down a new event loop. To amortize the loop setup across calls:
+
+    - `mode="runner"` runs the calls on a long-lived `asyncio.Runner` per thread.
+    - `mode="thread"` submits the calls to a single event loop running in a background
+      thread. The calls from all threads share this loop, and hence can share loop-bound
+      resources, such as connections.
+
+    The long-lived loops are closed at exit. As with `asyncio.run()`, the calls can't be
+    made from a running event loop, except the calls in `"thread"` mode made from
+    another loop.
+    """
+
+    if func is None:
+        return partial(asyncio_run, mode=mode)
+
+    try:
+        run = RUN_MODES[mode]
+    except KeyError:
+        raise ValueError(f"unknown mode: {mode!r}") from None
 
     @wraps(func)
     def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
-        return asyncio.run(func(*args, **kwargs))
+        return run(func(*args, **kwargs))
 
     return wrapper
 
@@ -90,3 +595,878 @@ def maybe_install_uvloop() -> None:
         pass
     else:
         uvloop.install()
+
+
+@overload
+def asingleflight(
+    func: None = None, *, retain: float = 0, typed: bool = False
+) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    ...
+
+
+@overload
+def asingleflight(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+    ...
+
+
+def asingleflight(
+    func: Callable[P, Awaitable[R]] | None = None,
+    *,
+    retain: float = 0,
+    typed: bool = False,
+) -> (
+    Callable[P, Awaitable[R]]
+    | Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]
+):
+    """
+    Coalesce concurrent calls with the same arguments from multiple tasks, such that
+    only the first call executes the async function, and the other calls await and share
+    its result or exception.
+
+    The execution runs in its own task, so cancelling any of the callers doesn't cancel
+    the shared execution. If `retain` is positive, successful results are additionally
+    shared with calls arriving within `retain` seconds after completion. Calls are only
+    coalesced within the same event loop. See `singleflight()` in `recipes.functools`
+    for the thread-based counterpart.
+    """
+
+    if func is None:
+        return partial(asingleflight, retain=retain, typed=typed)
+
+    # Map keys to their task and the deadline until which its result is shared
+    tasks: dict[Hashable, tuple[asyncio.Future[R], float]] = {}
+
+    def forget(key: Hashable, task: asyncio.Future[R]) -> None:
+        if key in tasks and tasks[key][0] is task:
+            del tasks[key]
+
+    def on_done(key: Hashable, task: asyncio.Future[R]) -> None:
+        if retain > 0 and not task.cancelled() and task.exception() is None:
+            if key in tasks and tasks[key][0] is task:
+                tasks[key] = (task, time.monotonic() + retain)
+            # The loop may close before the callback fires, hence the deadline above
+            task.get_loop().call_later(retain, forget, key, task)
+        else:
+            forget(key, task)
+
+    @wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+
+        key = make_key(args, kwargs, typed)
+
+        entry = tasks.get(key)
+        if (
+            entry is None
+            or entry[1] <= time.monotonic()
+            or entry[0].get_loop() is not asyncio.get_running_loop()
+        ):
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            tasks[key] = (task, float("inf"))
+            task.add_done_callback(partial(on_done, key))
+        else:
+            task = entry[0]
+
+        return await asyncio.shield(task)
+
+    return wrapper
+
+
+async def amap(
+    func: Callable[[T], Awaitable[R]],
+    iterable: Iterable[T] | AsyncIterable[T],
+    *,
+    concurrency: int = 8,
+    ordered: bool = True,
+    window: int | None = None,
+    timeout: float | None = None,
+    retries: int = 0,
+    retry_delay: float = 0,
+) -> AsyncIterator[R]:
+    """
+    Apply the async function to the items of a sync or async iterable, with at most
+    `concurrency` calls in flight, and yield the results in the order of the items if
+    `ordered` is true, or in the order of completion otherwise.
+
+    The calls are made by a fixed pool of `concurrency` worker tasks, which pull items
+    from the iterable on demand. At most `window` items (defaulting to twice the
+    concurrency) are pulled but not yet yielded, which bounds the memory used by the
+    reorder buffer in ordered mode, and applies backpressure when the consumer is slow.
+
+    Each call is retried up to `retries` times, after `retry_delay` seconds, if it
+    raises an exception or doesn't complete within `timeout` seconds. The exception of
+    the last attempt, or of the iterable, is raised in place of the result. Once the
+    iteration stops, whether by exception, cancellation or early close, the pending
+    calls are cancelled.
+
+    Usage:
+
+        ```
+        async for page in amap(fetch, urls, concurrency=16):
+            ...
+        ```
+    """
+
+    if concurrency < 1:
+        raise ValueError("concurrency should be a positive integer")
+    if window is None:
+        window = 2 * concurrency
+    if window < concurrency:
+        raise ValueError("window should not be less than concurrency")
+
+    if isinstance(iterable, AsyncIterable):
+        aiterator = aiter(iterable)
+
+        async def pull() -> T:
+            return await anext(aiterator)
+
+    else:
+        iterator = iter(iterable)
+
+        async def pull() -> T:
+            try:
+                return next(iterator)
+            except StopIteration:
+                raise StopAsyncIteration from None
+
+    pull_lock = asyncio.Lock()
+    slots = asyncio.Semaphore(window)
+    # Messages of (index, exception, result), or None when a worker exits
+    messages: asyncio.Queue[tuple[int, BaseException | None, Any] | None]
+    messages = asyncio.Queue()
+    npulled = 0
+    exhausted = False
+
+    async def call(item: T) -> R:
+        for attempt in range(retries + 1):
+            try:
+                return await asyncio.wait_for(func(item), timeout)
+            except Exception:
+                if attempt == retries:
+                    raise
+            await asyncio.sleep(retry_delay)
+        raise AssertionError("unreachable")
+
+    async def worker() -> None:
+        nonlocal npulled, exhausted
+
+        try:
+            while True:
+                await slots.acquire()
+
+                async with pull_lock:
+                    if exhausted:
+                        return
+                    index = npulled
+                    try:
+                        item = await pull()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        return
+                    except Exception as exc:
+                        exhausted = True
+                        messages.put_nowait((index, exc, None))
+                        return
+                    npulled += 1
+
+                try:
+                    messages.put_nowait((index, None, await call(item)))
+                except Exception as exc:
+                    messages.put_nowait((index, exc, None))
+
+        finally:
+            messages.put_nowait(None)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    nrunning = concurrency
+    reorder_buffer: dict[int, tuple[BaseException | None, Any]] = {}
+    next_index = 0
+
+    try:
+        while nrunning:
+
+            message = await messages.get()
+            if message is None:
+                nrunning -= 1
+                continue
+
+            index, exc, result = message
+
+            if not ordered:
+                slots.release()
+                if exc is not None:
+                    raise exc
+                yield result
+                continue
+
+            reorder_buffer[index] = (exc, result)
+            while next_index in reorder_buffer:
+                exc, result = reorder_buffer.pop(next_index)
+                next_index += 1
+                slots.release()
+                if exc is not None:
+                    raise exc
+                yield result
+
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def as_completed_map(
+    func: Callable[[T], Awaitable[R]],
+    iterable: Iterable[T] | AsyncIterable[T],
+    **kwargs: Any,
+) -> AsyncIterator[R]:
+    """
+    Shorthand for `amap(..., ordered=False)`, which yields the results in the order of
+    completion. At most `window` results are buffered.
+    """
+
+    return amap(func, iterable, ordered=False, **kwargs)
+
+
+def fan_out(
+    futures: Mapping[K, asyncio.Future[V] | concurrent.futures.Future[V]],
+    values: Iterable[V | BaseException],
+) -> None:
+    """Resolve the futures of a batch with the values returned by the bulk function"""
+
+    values = list(values)
+
+    if len(values) != len(futures):
+        exc = ValueError(
+            f"the bulk function returned {len(values)} values for {len(futures)} keys"
+        )
+        values = [exc] * len(futures)
+
+    for future, value in zip(futures.values(), values):
+        if future.done():
+            continue
+        if isinstance(value, BaseException):
+            future.set_exception(value)
+        else:
+            future.set_result(value)
+
+
+def fail_batch(
+    futures: Mapping[K, asyncio.Future[V] | concurrent.futures.Future[V]],
+    exc: BaseException,
+) -> None:
+    """Set the exception on the unresolved futures of a batch"""
+
+    for future in futures.values():
+        if not future.done():
+            future.set_exception(exc)
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    Coalesce individual loads of keys into calls of a bulk function.
+
+    Keys loaded within the same event loop iteration (or within `max_delay` seconds, if
+    specified) are collected into a batch, deduplicated, and passed as a list to the
+    `batch_load` async function, which should return an iterable of values in the same
+    order. A returned value that is an exception instance is raised to the loaders of
+    that key. Batches are dispatched early when reaching `max_batch_size`.
+
+    If `cache` is true, loaded values are memoized for the lifetime of the loader.
+
+    Usage:
+
+        ```
+        async def get_users(ids):
+            rows = await db.fetch_users(ids)
+            ...
+
+        loader = BatchLoader(get_users)
+        alice, bob = await asyncio.gather(loader.load(1), loader.load(2))
+        ```
+    """
+
+    def __init__(
+        self,
+        batch_load: Callable[[list[K]], Awaitable[Iterable[V | BaseException]]],
+        *,
+        max_batch_size: int | None = None,
+        max_delay: float = 0,
+        cache: bool = False,
+    ) -> None:
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._cache: dict[K, asyncio.Future[V]] | None = {} if cache else None
+        self._batch: dict[K, asyncio.Future[V]] = {}
+        self._handle: asyncio.Handle | None = None
+        # Keep strong references to the running batches, which the event loop doesn't
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def load(self, key: K) -> V:
+        """Load the value of the key"""
+
+        future = self._cache.get(key) if self._cache is not None else None
+
+        if future is None:
+            future = self._batch.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._batch[key] = loop.create_future()
+            if self._cache is not None:
+                self._cache[key] = future
+
+            if (
+                self.max_batch_size is not None
+                and len(self._batch) >= self.max_batch_size
+            ):
+                self._dispatch()
+            elif self._handle is None:
+                if self.max_delay > 0:
+                    self._handle = loop.call_later(self.max_delay, self._dispatch)
+                else:
+                    self._handle = loop.call_soon(self._dispatch)
+
+        # Shield the future shared with other loaders from cancellation of this loader
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[K]) -> list[V]:
+        """Load the values of the keys"""
+
+        return await asyncio.gather(*map(self.load, keys))
+
+    def clear(self, key: K | None = None) -> None:
+        """Remove the key from the cache, or clear the whole cache if no key given"""
+
+        if self._cache is None:
+            return
+
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    def _dispatch(self) -> None:
+
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        batch, self._batch = self._batch, {}
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: dict[K, asyncio.Future[V]]) -> None:
+
+        # Resolve every future whatever happens, or their loaders would hang forever
+        try:
+            fan_out(batch, await self.batch_load(list(batch)))
+        except BaseException as exc:
+            fail_batch(batch, exc)
+            if not isinstance(exc, Exception):
+                raise
+        finally:
+            # Don't cache failures
+            if self._cache is not None:
+                for key, future in batch.items():
+                    if future.cancelled() or future.exception() is not None:
+                        if self._cache.get(key) is future:
+                            del self._cache[key]
+
+
+class PendingBatch(Generic[K, V]):
+    """A batch of keys being collected by `ThreadBatchLoader`"""
+
+    def __init__(self) -> None:
+        self.futures: dict[K, concurrent.futures.Future[V]] = {}
+        self.full = threading.Event()
+
+
+class ThreadBatchLoader(Generic[K, V]):
+    """
+    The thread-based counterpart of `BatchLoader`, for synchronous code.
+
+    Keys loaded by multiple threads within `max_delay` seconds are collected into a
+    batch, deduplicated, and passed as a list to the `batch_load` function, which is
+    called by the thread that started the batch. Other threads block until their values
+    are available.
+    """
+
+    def __init__(
+        self,
+        batch_load: Callable[[list[K]], Iterable[V | BaseException]],
+        *,
+        max_batch_size: int | None = None,
+        max_delay: float = 0.005,
+        cache: bool = False,
+    ) -> None:
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._cache: dict[K, concurrent.futures.Future[V]] | None = (
+            {} if cache else None
+        )
+        self._batch: PendingBatch[K, V] | None = None
+        self._lock = threading.Lock()
+
+    def load(self, key: K) -> V:
+        """Load the value of the key"""
+
+        future, batch = self._submit(key)
+        if batch is not None:
+            self._lead(batch)
+
+        return future.result()
+
+    def load_many(self, keys: Iterable[K]) -> list[V]:
+        """Load the values of the keys"""
+
+        futures = []
+        batches = []
+
+        for key in keys:
+            future, batch = self._submit(key)
+            futures.append(future)
+            if batch is not None:
+                batches.append(batch)
+
+        for batch in batches:
+            self._lead(batch)
+
+        return [future.result() for future in futures]
+
+    def _submit(
+        self, key: K
+    ) -> tuple[concurrent.futures.Future[V], PendingBatch[K, V] | None]:
+        """
+        Add the key to the pending batch. Return the future of its value, and the batch
+        if the caller started a new batch and hence is responsible for running it.
+        """
+
+        with self._lock:
+            future = self._cache.get(key) if self._cache is not None else None
+            if future is not None:
+                return future, None
+
+            batch = self._batch
+            leader = batch is None
+            if batch is None:
+                batch = self._batch = PendingBatch()
+
+            future = batch.futures.get(key)
+            if future is None:
+                future = batch.futures[key] = concurrent.futures.Future()
+                if self._cache is not None:
+                    self._cache[key] = future
+
+            if (
+                self.max_batch_size is not None
+                and len(batch.futures) >= self.max_batch_size
+            ):
+                # Detach the full batch, so that later loads start a new one
+                self._batch = None
+                batch.full.set()
+
+            return future, batch if leader else None
+
+    def _lead(self, batch: PendingBatch[K, V]) -> None:
+
+        batch.full.wait(self.max_delay)
+
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+
+        self._run_batch(batch)
+
+    def clear(self, key: K | None = None) -> None:
+        """Remove the key from the cache, or clear the whole cache if no key given"""
+
+        with self._lock:
+            if self._cache is None:
+                return
+
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+    def _run_batch(self, batch: PendingBatch[K, V]) -> None:
+
+        # Resolve every future whatever happens, or other threads would block forever
+        try:
+            fan_out(batch.futures, self.batch_load(list(batch.futures)))
+        except BaseException as exc:
+            fail_batch(batch.futures, exc)
+            if not isinstance(exc, Exception):
+                raise
+        finally:
+            # Don't cache failures
+            if self._cache is not None:
+                with self._lock:
+                    for key, future in batch.futures.items():
+                        if future.exception() is not None:
+                            if self._cache.get(key) is future:
+                                del self._cache[key]
+
+
+class LoopEvent(NamedTuple):
+    """
+    A metric emitted by `LoopMonitor`, which is one of:
+
+    - `"lag"`: the scheduling lag of a timer probe, in seconds.
+    - `"tasks"`: the number of live tasks.
+    - `"slow_callback"`: the time in seconds a callback has been blocking the loop,
+      with the stack of the loop thread as `detail`.
+    """
+
+    kind: str
+    value: float
+    detail: str | None = None
+
+
+class TimedCoroutine(Coroutine[Any, Any, R]):
+    """Wrap a coroutine to accumulate the time spent in each of its steps"""
+
+    __slots__ = ("coro", "name", "times")
+
+    def __init__(self, coro: Coroutine[Any, Any, R], times: dict[str, float]) -> None:
+        self.coro = coro
+        self.name = getattr(coro, "__qualname__", type(coro).__qualname__)
+        self.times = times
+
+    def send(self, value: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return self.coro.send(value)
+        finally:
+            self.times[self.name] = (
+                self.times.get(self.name, 0) + time.perf_counter() - start
+            )
+
+    def throw(self, *args: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return self.coro.throw(*args)
+        finally:
+            self.times[self.name] = (
+                self.times.get(self.name, 0) + time.perf_counter() - start
+            )
+
+    def close(self) -> None:
+        self.coro.close()
+
+    def __await__(self) -> Generator[Any, None, R]:
+        return self.coro.__await__()
+
+
+class LoopMonitor:
+    """
+    Monitor the health of an event loop.
+
+    - A timer probe is scheduled every `interval` seconds, and the delay of its actual
+      run from its scheduled time is emitted as the `"lag"` event, along with the
+      number of live tasks as the `"tasks"` event.
+    - A watchdog thread checks that the probes keep running. If the loop is blocked by
+      a callback for more than `threshold` seconds, the stack of the loop thread is
+      captured and emitted as the `"slow_callback"` event, once per blocking callback.
+    - If `track_coroutines` is true, a task factory is installed to accumulate the
+      time spent in each coroutine function into `coroutine_times`, keyed by qualified
+      names. This adds overhead to every step of every task.
+
+    Events are passed to `sink`, which by default appends them to `events`, bounded to
+    the latest `maxlen` events. The sink of slow callbacks is called from the watchdog
+    thread.
+
+    Usage:
+
+        ```
+        async with LoopMonitor(sink=print):
+            await serve()
+        ```
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.1,
+        threshold: float = 0.1,
+        track_coroutines: bool = False,
+        sink: Callable[[LoopEvent], None] | None = None,
+        maxlen: int = 10_000,
+    ) -> None:
+
+        self.interval = interval
+        self.threshold = threshold
+        self.track_coroutines = track_coroutines
+        self.events: deque[LoopEvent] = deque(maxlen=maxlen)
+        self.sink = sink if sink is not None else self.events.append
+        self.coroutine_times: dict[str, float] = {}
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._heartbeat = 0.0
+        self._stopped = threading.Event()
+        self._watchdog: threading.Thread | None = None
+        self._orig_task_factory: Any = None
+
+    def start(self) -> None:
+        """Start monitoring the running event loop"""
+
+        if self._loop is not None:
+            raise RuntimeError("the monitor is already started")
+
+        loop = self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._heartbeat = time.monotonic()
+
+        if self.track_coroutines:
+            self._orig_task_factory = loop.get_task_factory()
+            loop.set_task_factory(self._task_factory)  # type: ignore
+
+        self._handle = loop.call_later(
+            self.interval, self._probe, loop.time() + self.interval
+        )
+        self._watchdog = threading.Thread(
+            target=self._watch, name="LoopMonitor", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        """Stop monitoring. Must be called from the thread of the event loop."""
+
+        if self._loop is None:
+            return
+
+        self._stopped.set()
+        assert self._watchdog is not None
+        self._watchdog.join()
+
+        if self._handle is not None:
+            self._handle.cancel()
+        if self.track_coroutines:
+            self._loop.set_task_factory(self._orig_task_factory)
+
+        self._loop = self._handle = self._watchdog = None
+
+    async def __aenter__(self) -> LoopMonitor:
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _probe(self, scheduled: float) -> None:
+
+        loop = self._loop
+        assert loop is not None
+
+        now = loop.time()
+        self._heartbeat = time.monotonic()
+        self.sink(LoopEvent("lag", max(now - scheduled, 0)))
+        self.sink(LoopEvent("tasks", len(asyncio.all_tasks(loop))))
+
+        self._handle = loop.call_later(self.interval, self._probe, now + self.interval)
+
+    def _watch(self) -> None:
+
+        # The heartbeat of the last reported slow callback, to report each only once
+        reported = None
+
+        while not self._stopped.wait(min(self.interval, self.threshold) / 2):
+
+            heartbeat = self._heartbeat
+            # The probe is expected to run every `interval` seconds
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked <= self.threshold or heartbeat == reported:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+            if frame is None:
+                continue
+
+            reported = heartbeat
+            stack = "".join(traceback.format_stack(frame))
+            self.sink(LoopEvent("slow_callback", blocked, stack))
+
+    def _task_factory(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        coro: Coroutine[Any, Any, Any],
+        **kwargs: Any,
+    ) -> asyncio.Future[Any]:
+
+        timed = TimedCoroutine(coro, self.coroutine_times)
+        if self._orig_task_factory is not None:
+            return self._orig_task_factory(loop, timed, **kwargs)
+        return asyncio.Task(timed, loop=loop, **kwargs)
+
+
+class RateLimit(Protocol):
+    """
+    A rate limit, which grants permits by reservations. Reservations are made in order,
+    and their granted times are non-decreasing, so that waiters wake in FIFO order.
+    """
+
+    def earliest(self, now: float) -> float:
+        """Return the earliest time, not before `now`, a permit can be granted at"""
+
+    def commit(self, at: float) -> None:
+        """Reserve a permit granted at the time returned by `earliest()`"""
+
+
+class TokenBucket:
+    """
+    Allow `rate` permits per second on average, with bursts of up to `burst` permits.
+
+    Implemented as the generic cell rate algorithm (GCRA), which is equivalent to a
+    token bucket, and tracks a single theoretical arrival time instead of a token
+    count refilled by a timer.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+
+        if rate <= 0:
+            raise ValueError("rate should be positive")
+        if burst < 1:
+            raise ValueError("burst should be a positive integer")
+
+        self.rate = rate
+        self.burst = burst
+        self._interval = 1 / rate
+        self._tolerance = (burst - 1) * self._interval
+        self._tat = float("-inf")  # Theoretical arrival time
+
+    def earliest(self, now: float) -> float:
+        return max(now, self._tat - self._tolerance)
+
+    def commit(self, at: float) -> None:
+        self._tat = max(self._tat, at) + self._interval
+
+
+class SlidingWindowLimit:
+    """Allow at most `limit` permits in any sliding window of `period` seconds"""
+
+    def __init__(self, limit: int, period: float) -> None:
+
+        if limit < 1:
+            raise ValueError("limit should be a positive integer")
+        if period <= 0:
+            raise ValueError("period should be positive")
+
+        self.limit = limit
+        self.period = period
+        # The granted times of the latest `limit` permits
+        self._grants: deque[float] = deque(maxlen=limit)
+
+    def earliest(self, now: float) -> float:
+        if len(self._grants) < self.limit:
+            return now
+        return max(now, self._grants[0] + self.period)
+
+    def commit(self, at: float) -> None:
+        self._grants.append(at)
+
+
+class CompositeLimit:
+    """Grant a permit only when all the limits allow it"""
+
+    def __init__(self, *limits: RateLimit) -> None:
+        self.limits = limits
+
+    def earliest(self, now: float) -> float:
+        return max((limit.earliest(now) for limit in self.limits), default=now)
+
+    def commit(self, at: float) -> None:
+        for limit in self.limits:
+            limit.commit(at)
+
+
+class RateLimiter:
+    """
+    Throttle sync and async calls to a rate limit, such as `TokenBucket`,
+    `SlidingWindowLimit` or `CompositeLimit`.
+
+    Each acquisition reserves a permit under a lock, and then sleeps until the granted
+    time, without polling. The reservations are shared by threads and event loops, and
+    are granted in FIFO order. A reservation is consumed even if its waiter is
+    cancelled.
+
+    Usage:
+
+        ```
+        limit = CompositeLimit(TokenBucket(10, burst=5), SlidingWindowLimit(100, 60))
+        limiter = RateLimiter(limit)
+
+        @limiter
+        async def fetch(url):
+            ...
+
+        with limiter:
+            ...
+        ```
+    """
+
+    def __init__(
+        self, limit: RateLimit, *, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.limit = limit
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserve a permit, and return the delay in seconds until it's granted"""
+
+        with self._lock:
+            now = self.clock()
+            at = self.limit.earliest(now)
+            self.limit.commit(at)
+
+        return at - now
+
+    def acquire(self) -> None:
+        """Block until a permit is granted"""
+
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self) -> None:
+        """Asynchronously wait until a permit is granted"""
+
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def __enter__(self) -> None:
+        self.acquire()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    async def __aenter__(self) -> None:
+        await self.aacquire()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+    def __call__(self, func: Callable[P, R]) -> Callable[P, R]:
+
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> Any:
+                await self.aacquire()
+                return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore
+
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            self.acquire()
+            return func(*args, **kwargs)
+
+        return wrapper
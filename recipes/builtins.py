@@ -1,15 +1,16 @@
 from __future__ import annotations  # for types imported from _typeshed
 
 import atexit
+import functools
 import sys
+import threading
+import weakref
 from collections.abc import Callable, Iterable, MutableSequence
 from typing import TYPE_CHECKING, Any, TypeVar, cast, overload
 
-import click
-import inflect
-
 
 if TYPE_CHECKING:
+    import inflect
     from _typeshed import StrPath
 
 
@@ -26,6 +27,7 @@ __all__ = [
     "ensure_type",
     "try_decode",
     "schedule_pause_at_exit",
+    "call_at_thread_exit",
 ]
 
 
@@ -35,7 +37,24 @@ T3 = TypeVar("T3")
 T4 = TypeVar("T4")
 
 
-p = inflect.engine()
+# Third-party dependencies are imported lazily, because they are slow to import, and
+# most users of this module don't need them.
+
+
+@functools.cache
+def inflect_engine() -> inflect.engine:
+    import inflect
+
+    return inflect.engine()
+
+
+def __getattr__(name: str) -> Any:
+
+    # The `p` global used to be an eagerly created inflect engine.
+    if name == "p":
+        return inflect_engine()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def hashable(obj: object, /) -> bool:
@@ -152,6 +171,7 @@ def ensure_type(obj: object, typ: type[T] | tuple[type[T], ...]) -> T:
         return cast(T, obj)
 
     else:
+        p = inflect_engine()
         types = typ if isinstance(typ, tuple) else (typ,)
         type_names = [t.__name__ for t in types]
         expected = p.a(p.join(type_names, conj="or"))
@@ -181,7 +201,10 @@ registered = False
 # unregister every occurrence of the function in the atexit call stack. It's possible
 # that other code registers `click.pause()` and we don't want to accidentally remove
 # theirs.
-my_pause = lambda msg: click.pause(msg)
+def my_pause(msg: str) -> None:
+    import click
+
+    click.pause(msg)
 
 
 def schedule_pause_at_exit(message: str | None = None) -> None:
@@ -208,6 +231,29 @@ def cancel() -> None:
 schedule_pause_at_exit.cancel = cancel
 
 
+class ThreadExitSentinel:
+    """A thread-local object, which is released when its thread ends"""
+
+
+THREAD_EXIT_SENTINELS = threading.local()
+
+
+def call_at_thread_exit(func: Callable[..., Any], *args: Any) -> None:
+    """
+    Call the function with the arguments when the current thread ends, or at exit if the
+    thread is still alive then. The function may be called from another thread.
+    """
+
+    try:
+        sentinels = THREAD_EXIT_SENTINELS.sentinels
+    except AttributeError:
+        sentinels = THREAD_EXIT_SENTINELS.sentinels = []
+
+    sentinel = ThreadExitSentinel()
+    sentinels.append(sentinel)
+    weakref.finalize(sentinel, func, *args)
+
+
 def lines(s: str) -> list[str]:
     return s.splitlines()
 
@@ -1,29 +1,63 @@
+import concurrent.futures
 import inspect
+import itertools
+import json
 import sys
+import threading
+from array import array
+from collections import deque
 from collections.abc import Callable, Generator, Iterator, Mapping
 from contextlib import AbstractContextManager, contextmanager
-from inspect import Parameter
+from contextvars import ContextVar
+from functools import wraps
+from inspect import Parameter, iscoroutinefunction
+from time import monotonic, perf_counter_ns
 from types import FunctionType, TracebackType
-from typing import Any, ParamSpec, TypeVar, overload
-
-import libcst as cst
-import libcst.matchers
-from libcst.metadata import PositionProvider
-from more_itertools import one
-
-from .builtins import ensure_type
-from .cst import contains_outdented_comment, transform_source
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Generic,
+    NamedTuple,
+    ParamSpec,
+    Protocol,
+    TypeVar,
+    overload,
+)
+
+from .builtins import call_at_thread_exit, ensure_type
 from .exceptions import OutdentedCommentError
 from .functools import noop, raiser
 from .inspect import get_function_body_source, getcallerframe, getsourcefilesource
 from .sourcelib import unindent_source
 
 
-__all__ = ["mock_globals", "contextmanagerclass", "skip_context", "literal_block"]
+if TYPE_CHECKING:
+    from _typeshed import StrPath
+
+
+__all__ = [
+    "mock_globals",
+    "contextmanagerclass",
+    "skip_context",
+    "literal_block",
+    "LatencyHistogram",
+    "ProfileRegistry",
+    "PROFILE_REGISTRY",
+    "profiled",
+    "SpanRecord",
+    "SpanExporter",
+    "InMemorySpanExporter",
+    "JSONLinesSpanExporter",
+    "set_span_exporter",
+    "span",
+    "PoolStats",
+    "Pool",
+]
 
 
 P = ParamSpec("P")
 R = TypeVar("R")
+T = TypeVar("T")
 
 
 @contextmanager
@@ -109,6 +143,13 @@ class literal_block_context(AbstractContextManager[str]):
 
     def __enter__(self) -> str:
 
+        import libcst as cst
+        import libcst.matchers
+        from libcst.metadata import PositionProvider
+        from more_itertools import one
+
+        from .cst import contains_outdented_comment
+
         frame = getcallerframe()
 
         source = getsourcefilesource(frame)
@@ -259,11 +300,20 @@ def literal_block(func: Callable = None) -> str | AbstractContextManager[str]:
             "@literal_block expects no outdented comments in the body of the decorated function"
         ) from None
 
+    import libcst as cst
+    import libcst.matchers
+
+    from .cst import tokens_from_matcher, transform_source
+
     m = libcst.matchers
 
+    replacement_field = m.Name(m.OneOf(*signature.parameters))
+
     class SurroundReplacementFieldsWithCurlyBraces(m.MatcherDecoratableTransformer):
 
-        @m.leave(m.Name(m.OneOf(*signature.parameters)))
+        prefilter_tokens = tokens_from_matcher(replacement_field)
+
+        @m.leave(replacement_field)
         def surround_with_curly_braces(
             self, original_node: cst.Name, updated_node: cst.Name
         ) -> cst.Set:
@@ -288,3 +338,969 @@ def literal_block(func: Callable = None) -> str | AbstractContextManager[str]:
             repls[name] = param.default
 
     return body_source.format_map(repls)
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies in nanoseconds, with fixed memory footprint.
+
+    Buckets are logarithmic, with four buckets per power of two, so that quantiles are
+    estimated within a relative error of 12.5%.
+    """
+
+    # A latency with bit length n >= 3 has its bucket determined by its top three bits,
+    # and falls into one of the buckets [4(n-3)+4, 4(n-3)+8). Latencies below 8 ns have
+    # their own buckets.
+    NBUCKETS = 4 * (64 - 3) + 8
+
+    __slots__ = ("counts",)
+
+    def __init__(self) -> None:
+        self.counts = [0] * self.NBUCKETS
+
+    @staticmethod
+    def bucket(ns: int) -> int:
+        """Return the bucket index of the latency"""
+
+        shift = ns.bit_length() - 3
+        if shift <= 0:
+            return ns
+        return (shift << 2) + (ns >> shift)
+
+    @staticmethod
+    def bucket_bounds(index: int) -> tuple[int, int]:
+        """Return the range `[low, high)` of latencies falling into the bucket"""
+
+        if index < 8:
+            return index, index + 1
+        shift = (index >> 2) - 1
+        mantissa = index - (shift << 2)
+        return mantissa << shift, (mantissa + 1) << shift
+
+    def record(self, ns: int) -> None:
+        self.counts[self.bucket(ns)] += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts = [x + y for x, y in zip(self.counts, other.counts)]
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-quantile of the latencies, as the midpoint of the bucket where it
+        falls. Return `nan` if the histogram is empty.
+        """
+
+        rank = q * self.total
+        cumulative = 0
+
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= rank:
+                low, high = self.bucket_bounds(index)
+                return (low + high - 1) / 2
+
+        return float("nan")
+
+    def to_dict(self) -> dict[int, int]:
+        """Return the non-empty buckets, as a mapping from lower bounds to counts"""
+
+        return {
+            self.bucket_bounds(index)[0]: count
+            for index, count in enumerate(self.counts)
+            if count
+        }
+
+
+class LatencyStats:
+    """The call count and latency statistics of a profiled target in one thread"""
+
+    __slots__ = ("calls", "total_ns", "max_ns", "histogram")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = LatencyHistogram()
+
+    def record(self, ns: int) -> None:
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.histogram.record(ns)
+
+    def merge(self, other: "LatencyStats") -> None:
+        self.calls += other.calls
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.histogram.merge(other.histogram)
+
+    def to_dict(self) -> dict[str, Any]:
+        sampled = self.histogram.total
+        return {
+            "calls": self.calls,
+            "sampled": sampled,
+            "total_ns": self.total_ns,
+            "mean_ns": self.total_ns / sampled if sampled else float("nan"),
+            "max_ns": self.max_ns,
+            "p50_ns": self.histogram.quantile(0.5),
+            "p90_ns": self.histogram.quantile(0.9),
+            "p99_ns": self.histogram.quantile(0.99),
+            "histogram": self.histogram.to_dict(),
+        }
+
+
+class ProfileRegistry:
+    """
+    A registry of call counts and latency statistics of profiled targets.
+
+    Each thread accumulates into its own statistics, which are only merged on read, so
+    recording never takes a lock. When a thread ends, its statistics are folded into
+    the totals of exited threads, so memory doesn't grow with thread churn.
+
+    `stats_type` can be a subclass of `LatencyStats` recording extra statistics.
+    """
+
+    def __init__(self, stats_type: type[LatencyStats] = LatencyStats) -> None:
+        self.stats_type = stats_type
+        self._local = threading.local()
+        # Map the ids of the statistics dicts of live threads to themselves
+        self._thread_stats: dict[int, dict[str, LatencyStats]] = {}
+        self._exited_stats: dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, name: str) -> LatencyStats:
+        """Return the statistics of the target in the current thread, for recording"""
+
+        try:
+            thread_stats = self._local.stats
+        except AttributeError:
+            thread_stats = self._local.stats = {}
+            with self._lock:
+                self._thread_stats[id(thread_stats)] = thread_stats
+            call_at_thread_exit(self._fold, thread_stats)
+
+        try:
+            return thread_stats[name]
+        except KeyError:
+            stats = thread_stats[name] = self.stats_type()
+            return stats
+
+    def _fold(self, thread_stats: dict[str, LatencyStats]) -> None:
+        """Fold the statistics of an exited thread into the totals of exited threads"""
+
+        with self._lock:
+            del self._thread_stats[id(thread_stats)]
+            for name, stats in thread_stats.items():
+                self._exited_stats.setdefault(name, self.stats_type()).merge(stats)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Merge the statistics across threads, and return them as plain dicts"""
+
+        merged: dict[str, LatencyStats] = {}
+
+        # Take both under the lock, so that a thread exiting meanwhile is counted once
+        with self._lock:
+            all_thread_stats = list(self._thread_stats.values())
+            for name, stats in self._exited_stats.items():
+                merged.setdefault(name, self.stats_type()).merge(stats)
+
+        for thread_stats in all_thread_stats:
+            # Copy, as the owner thread may be adding new targets concurrently
+            for name, stats in thread_stats.copy().items():
+                merged.setdefault(name, self.stats_type()).merge(stats)
+
+        return {name: stats.to_dict() for name, stats in sorted(merged.items())}
+
+    def to_json(self, **kwargs: Any) -> str:
+        """Return the snapshot serialized as JSON"""
+
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def reset(self) -> None:
+        """Discard all statistics"""
+
+        with self._lock:
+            for thread_stats in self._thread_stats.values():
+                thread_stats.clear()
+            self._exited_stats.clear()
+
+
+PROFILE_REGISTRY = ProfileRegistry()
+
+
+class profiled:
+    """
+    Record the call count and latencies of a function or a block of code into a
+    `ProfileRegistry`, which is the process-wide `PROFILE_REGISTRY` by default.
+
+    Latencies are measured with `time.perf_counter_ns()`. If `sample` is greater than 1,
+    only one in every `sample` calls is timed, while all calls are counted. When used as
+    a decorator, the name defaults to the qualified name of the function. Async
+    functions are timed until their completion.
+
+    Usage:
+
+        ```
+        @profiled()
+        def handle(request):
+            ...
+
+        with profiled("load"):
+            ...
+
+        PROFILE_REGISTRY.snapshot()
+        ```
+
+    As a context manager, an instance should not be entered concurrently from multiple
+    threads. Create an instance per `with` statement instead.
+    """
+
+    def __init__(
+        self,
+        name: str | None = None,
+        *,
+        sample: int = 1,
+        registry: ProfileRegistry | None = None,
+    ) -> None:
+
+        if sample < 1:
+            raise ValueError("sample should be a positive integer")
+
+        self.name = name
+        self.sample = sample
+        self.registry = registry if registry is not None else PROFILE_REGISTRY
+        self._starts: list[int | None] = []
+
+    def __call__(self, func: Callable[P, R]) -> Callable[P, R]:
+
+        name = self.name or f"{func.__module__}.{func.__qualname__}"
+        sample = self.sample
+        registry = self.registry
+
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> Any:
+                stats = registry.stats(name)
+                stats.calls += 1
+                if stats.calls % sample:
+                    return await func(*args, **kwargs)
+
+                start = perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    stats.record(perf_counter_ns() - start)
+
+            return async_wrapper  # type: ignore
+
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            stats = registry.stats(name)
+            stats.calls += 1
+            if stats.calls % sample:
+                return func(*args, **kwargs)
+
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.record(perf_counter_ns() - start)
+
+        return wrapper
+
+    def __enter__(self) -> None:
+
+        if self.name is None:
+            raise TypeError("profiled() requires a name when used as a context manager")
+
+        stats = self.registry.stats(self.name)
+        stats.calls += 1
+        self._starts.append(None if stats.calls % self.sample else perf_counter_ns())
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+
+        end = perf_counter_ns()
+        start = self._starts.pop()
+        if start is not None:
+            assert self.name is not None
+            self.registry.stats(self.name).record(end - start)
+
+
+class SpanRecord(NamedTuple):
+    """A finished span. The spans of a trace form a tree via their parent ids."""
+
+    trace_id: int
+    span_id: int
+    parent_id: int | None
+    name: str
+    start_ns: int
+    end_ns: int
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+
+class SpanBuffer:
+    """
+    The spans of one trace, stored in preallocated parallel arrays, which grow by
+    doubling when full, and are reused across traces.
+
+    A buffer is retired by resetting its trace id to 0 before being reused, so that
+    contexts still referencing it under a previous trace id can't write into it.
+    """
+
+    INITIAL_CAPACITY = 32
+
+    __slots__ = (
+        "trace_id",
+        "size",
+        "open",
+        "names",
+        "parents",
+        "starts",
+        "ends",
+        "lock",
+    )
+
+    def __init__(self) -> None:
+        capacity = self.INITIAL_CAPACITY
+        self.lock = threading.Lock()
+        self.trace_id = 0
+        self.size = 0
+        self.open = 0
+        self.names: list[str] = [""] * capacity
+        self.parents = array("q", bytes(8 * capacity))
+        self.starts = array("q", bytes(8 * capacity))
+        self.ends = array("q", bytes(8 * capacity))
+
+    def add(self, name: str, parent: int, trace_id: int) -> int | None:
+        """
+        Open a span, and return its id. Return `None` if the buffer no longer holds the
+        trace, as it's retired or reused.
+        """
+
+        # Spans of a trace can be opened from multiple threads, if the context is
+        # propagated with `contextvars.copy_context()` or `asyncio.to_thread()`.
+        with self.lock:
+            if self.trace_id != trace_id:
+                return None
+            index = self.size
+            if index == len(self.names):
+                self.names += self.names
+                self.parents += self.parents
+                self.starts += self.starts
+                self.ends += self.ends
+            self.size += 1
+            self.open += 1
+
+        self.names[index] = name
+        self.parents[index] = parent
+        self.ends[index] = -1
+        self.starts[index] = perf_counter_ns()
+        return index
+
+    def finish(self, index: int) -> None:
+        """Close the span"""
+
+        self.ends[index] = perf_counter_ns()
+        with self.lock:
+            self.open -= 1
+
+    def retire(self) -> bool:
+        """
+        Retire the buffer if no span is still open, and return whether it's retired, in
+        which case it can be reused.
+        """
+
+        with self.lock:
+            if self.open:
+                return False
+            self.trace_id = 0
+            return True
+
+    def records(self) -> list[SpanRecord]:
+        return [
+            SpanRecord(
+                self.trace_id,
+                index,
+                self.parents[index] if self.parents[index] >= 0 else None,
+                self.names[index],
+                self.starts[index],
+                self.ends[index],
+            )
+            for index in range(self.size)
+        ]
+
+
+# Recycled span buffers
+SPAN_BUFFER_POOL: list[SpanBuffer] = []
+
+TRACE_IDS = itertools.count(1)
+
+
+def acquire_span_buffer() -> SpanBuffer:
+    try:
+        buffer = SPAN_BUFFER_POOL.pop()
+    except IndexError:
+        buffer = SpanBuffer()
+    with buffer.lock:
+        buffer.trace_id = next(TRACE_IDS)
+        buffer.size = 0
+        buffer.open = 0
+    return buffer
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[SpanRecord]) -> None:
+        """Export the spans of a finished trace"""
+
+
+class InMemorySpanExporter:
+    """Collect the spans of finished traces in memory"""
+
+    def __init__(self) -> None:
+        self.traces: list[list[SpanRecord]] = []
+
+    def export(self, spans: list[SpanRecord]) -> None:
+        self.traces.append(spans)
+
+
+class JSONLinesSpanExporter:
+    """Append the spans of finished traces to a file, one JSON object per line"""
+
+    def __init__(self, file: "StrPath") -> None:
+        self.file = file
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[SpanRecord]) -> None:
+        lines = "".join(json.dumps(span._asdict()) + "\n" for span in spans)
+        with self._lock, open(self.file, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+span_exporter: SpanExporter | None = None
+
+
+def set_span_exporter(exporter: SpanExporter | None) -> SpanExporter | None:
+    """
+    Set the exporter that finished traces are exported to, and return the previous one.
+    Traces are discarded if no exporter is set.
+    """
+
+    global span_exporter
+    previous, span_exporter = span_exporter, exporter
+    return previous
+
+
+# The span buffer of the current trace, and the id of the current span
+# The buffer, trace id and span id of the current span
+current_span: ContextVar[tuple[SpanBuffer, int, int] | None] = ContextVar(
+    "current_span", default=None
+)
+
+
+class span:
+    """
+    Time a block of code as a span, nested under the enclosing span in the current
+    context, if any. A span without enclosing span starts a new trace, which is exported
+    when the span finishes. See `set_span_exporter()`.
+
+    The current span is tracked with `contextvars`, so spans nest correctly across
+    threads and asyncio tasks: tasks inherit the current span of their creator, while
+    threads start afresh unless the context is copied. A span opened after the trace of
+    its enclosing span was exported, such as by a detached task, starts a new trace.
+
+    Usage:
+
+        ```
+        with span("request"):
+            with span("parse"):
+                ...
+            async with span("query"):
+                ...
+        ```
+    """
+
+    __slots__ = ("name", "_buffer", "_index", "_token")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> None:
+
+        index = None
+
+        current = current_span.get()
+        if current is not None:
+            buffer, trace_id, parent = current
+            index = buffer.add(self.name, parent, trace_id)
+
+        # Start a new trace if there is no enclosing span, or its trace is finished
+        if index is None:
+            buffer = acquire_span_buffer()
+            trace_id = buffer.trace_id
+            index = buffer.add(self.name, -1, trace_id)
+            assert index is not None
+
+        self._buffer = buffer
+        self._index = index
+        self._token = current_span.set((buffer, trace_id, index))
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+
+        buffer = self._buffer
+        buffer.finish(self._index)
+        current_span.reset(self._token)
+
+        if buffer.parents[self._index] >= 0:
+            return
+
+        # The root span finishes the trace
+        exporter = span_exporter
+        if exporter is not None:
+            exporter.export(buffer.records())
+
+        # Spans outliving the root span may still write to the buffer, in which case it
+        # can't be reused.
+        if buffer.retire():
+            SPAN_BUFFER_POOL.append(buffer)
+
+    async def __aenter__(self) -> None:
+        self.__enter__()
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.__exit__(exc_type, exc_value, traceback)
+
+
+# Handed to a waiter of a pool in place of an object, to create an object in the slot
+# freed by a destroyed object
+CREATE = object()
+
+
+class PoolStats(NamedTuple):
+    """
+    The statistics of a `Pool`. Wait times are in seconds. Utilization is the average
+    fraction of the maximum size in use since the creation of the pool.
+    """
+
+    size: int
+    in_use: int
+    idle: int
+    created: int
+    destroyed: int
+    acquisitions: int
+    waits: int
+    total_wait: float
+    max_wait: float
+    utilization: float
+
+
+class PoolLease(Generic[T]):
+    """Check out an object from a pool on enter, and return it on exit"""
+
+    __slots__ = ("pool", "timeout", "obj")
+
+    def __init__(self, pool: "Pool[T]", timeout: float | None) -> None:
+        self.pool = pool
+        self.timeout = timeout
+
+    def __enter__(self) -> T:
+        self.obj = self.pool._acquire(self.timeout)
+        return self.obj
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.pool._release(self.obj)
+
+    async def __aenter__(self) -> T:
+        self.obj = await self.pool._aacquire(self.timeout)
+        return self.obj
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.pool._release(self.obj)
+
+
+class Pool(Generic[T]):
+    """
+    A thread-safe pool of reusable objects, created by `factory` on demand, up to
+    `max_size` objects.
+
+    - When all the objects are in use, callers wait, and are handed the returned
+      objects in FIFO order.
+    - Idle objects are checked by `check` on checkout, if specified, and are destroyed
+      if unhealthy.
+    - Objects idle for more than `max_idle` seconds are evicted when objects are
+      returned, or when `evict_idle()` is called, keeping at least `min_size` objects.
+      `fill()` creates objects up to `min_size` in advance.
+    - Objects are destroyed by calling `destroy` on them, if specified.
+
+    Usage:
+
+        ```
+        pool = Pool(lambda: sqlite3.connect(path, check_same_thread=False), max_size=4)
+
+        with pool.acquire() as conn:
+            ...
+
+        async with pool.acquire(timeout=5) as conn:
+            ...
+        ```
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        *,
+        min_size: int = 0,
+        max_size: int = 8,
+        check: Callable[[T], bool] | None = None,
+        destroy: Callable[[T], object] | None = None,
+        max_idle: float | None = None,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+
+        if max_size < 1:
+            raise ValueError("max_size should be a positive integer")
+        if not 0 <= min_size <= max_size:
+            raise ValueError("min_size should be between 0 and max_size")
+
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.check = check
+        self.destroy = destroy
+        self.max_idle = max_idle
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        # Idle objects with the time they were returned, the most recent at the right
+        self._idle: deque[tuple[T, float]] = deque()
+        self._waiters: deque[concurrent.futures.Future[Any]] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+
+        self._created = 0
+        self._destroyed = 0
+        self._acquisitions = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._start = self._last_change = clock()
+        self._busy = 0.0  # The integral of the number of objects in use over time
+
+    def acquire(self, timeout: float | None = None) -> PoolLease[T]:
+        """
+        Return a context manager, sync or async, which checks out an object. Raise
+        `TimeoutError` if no object is available within `timeout` seconds.
+        """
+
+        return PoolLease(self, timeout)
+
+    def _update_busy(self, delta: int) -> None:
+        """Update the number of objects in use. The lock must be held."""
+
+        now = self.clock()
+        self._busy += self._in_use * (now - self._last_change)
+        self._last_change = now
+        self._in_use += delta
+
+    def _reserve(self) -> tuple[Any, concurrent.futures.Future[Any] | None]:
+        """
+        Reserve an idle object, or a slot for `CREATE`. If neither is available, return
+        a future resolved with either of them later, handed off by other callers.
+        """
+
+        with self._lock:
+
+            if self._closed:
+                raise RuntimeError("the pool is closed")
+
+            if self._idle:
+                obj, _ = self._idle.pop()
+                self._update_busy(1)
+                return obj, None
+
+            if self._size < self.max_size:
+                self._size += 1
+                self._update_busy(1)
+                return CREATE, None
+
+            waiter: concurrent.futures.Future[Any] = concurrent.futures.Future()
+            self._waiters.append(waiter)
+            return None, waiter
+
+    def _hand_off(self, item: Any) -> bool:
+        """Hand the object or `CREATE` to the first waiter. The lock must be held."""
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if waiter.set_running_or_notify_cancel():
+                waiter.set_result(item)
+                return True
+
+        return False
+
+    def _prepare(self, item: Any) -> Any:
+        """
+        Create an object if `CREATE`, or check the health of the object. Return the
+        object, or `CREATE` if the object is unhealthy, in which case it's discarded.
+        """
+
+        if item is CREATE:
+            try:
+                obj = self.factory()
+            except BaseException:
+                self._discard(CREATE)
+                raise
+            with self._lock:
+                self._created += 1
+            return obj
+
+        try:
+            healthy = self.check is None or self.check(item)
+        except Exception:
+            healthy = False
+
+        if healthy:
+            return item
+
+        self._discard(item)
+        return CREATE
+
+    def _record_wait(self, start: float, waited: bool) -> None:
+
+        wait = self.clock() - start
+
+        with self._lock:
+            self._acquisitions += 1
+            if waited:
+                self._waits += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def _acquire(self, timeout: float | None) -> T:
+
+        start = self.clock()
+        waited = False
+
+        while True:
+            item, waiter = self._reserve()
+
+            if waiter is not None:
+                waited = True
+                remaining = None if timeout is None else start + timeout - self.clock()
+                try:
+                    item = waiter.result(remaining)
+                except TimeoutError:
+                    if waiter.cancel():
+                        raise TimeoutError("timed out waiting for a pooled object")
+                    # The waiter is being resolved concurrently
+                    item = waiter.result()
+
+            obj = self._prepare(item)
+            if obj is not CREATE:
+                self._record_wait(start, waited)
+                return obj
+
+    async def _aacquire(self, timeout: float | None) -> T:
+
+        import asyncio
+
+        start = self.clock()
+        waited = False
+
+        while True:
+            item, waiter = self._reserve()
+
+            if waiter is not None:
+                waited = True
+                remaining = None if timeout is None else start + timeout - self.clock()
+                try:
+                    # Shield the waiter, so that it's only cancelled if not resolved
+                    future = asyncio.wrap_future(waiter)
+                    item = await asyncio.wait_for(asyncio.shield(future), remaining)
+                except (asyncio.CancelledError, TimeoutError):
+                    if waiter.cancel():
+                        raise
+                    # The object is handed off concurrently, so give it back
+                    self._give_back(waiter.result())
+                    raise
+
+            obj = self._prepare(item)
+            if obj is not CREATE:
+                self._record_wait(start, waited)
+                return obj
+
+    def _give_back(self, item: Any) -> None:
+        if item is CREATE:
+            self._discard(CREATE)
+        else:
+            self._release(item)
+
+    def _release(self, obj: T) -> None:
+        """Return an object to the pool"""
+
+        to_destroy = []
+
+        with self._lock:
+
+            if not self._closed and self._hand_off(obj):
+                return
+
+            self._update_busy(-1)
+
+            if self._closed:
+                self._size -= 1
+                to_destroy.append(obj)
+            else:
+                self._idle.append((obj, self.clock()))
+                to_destroy = self._evict_idle()
+
+        for obj in to_destroy:
+            self._destroy(obj)
+
+    def _discard(self, item: Any) -> None:
+        """Free the slot of an unhealthy object, or of a failed creation"""
+
+        with self._lock:
+            if self._closed or not self._hand_off(CREATE):
+                self._update_busy(-1)
+                self._size -= 1
+
+        if item is not CREATE:
+            self._destroy(item)
+
+    def _destroy(self, obj: T) -> None:
+
+        with self._lock:
+            self._destroyed += 1
+
+        if self.destroy is not None:
+            self.destroy(obj)
+
+    def _evict_idle(self) -> list[T]:
+        """Remove the expired idle objects. The lock must be held."""
+
+        evicted: list[T] = []
+
+        if self.max_idle is None:
+            return evicted
+
+        deadline = self.clock() - self.max_idle
+        while self._idle and self._size > self.min_size and self._idle[0][1] < deadline:
+            evicted.append(self._idle.popleft()[0])
+            self._size -= 1
+
+        return evicted
+
+    def evict_idle(self) -> None:
+        """Destroy the objects idle for more than `max_idle` seconds"""
+
+        with self._lock:
+            evicted = self._evict_idle()
+
+        for obj in evicted:
+            self._destroy(obj)
+
+    def fill(self) -> None:
+        """Create objects until the pool has at least `min_size` objects"""
+
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+
+            try:
+                obj = self.factory()
+            except BaseException:
+                with self._lock:
+                    self._size -= 1
+                raise
+
+            with self._lock:
+                self._created += 1
+                if self._hand_off(obj):
+                    self._update_busy(1)
+                else:
+                    self._idle.appendleft((obj, self.clock()))
+
+    def stats(self) -> PoolStats:
+
+        with self._lock:
+            self._update_busy(0)
+            elapsed = self._last_change - self._start
+            capacity = self.max_size * elapsed
+            return PoolStats(
+                size=self._size,
+                in_use=self._in_use,
+                idle=len(self._idle),
+                created=self._created,
+                destroyed=self._destroyed,
+                acquisitions=self._acquisitions,
+                waits=self._waits,
+                total_wait=self._total_wait,
+                max_wait=self._max_wait,
+                utilization=self._busy / capacity if capacity else 0.0,
+            )
+
+    def close(self) -> None:
+        """
+        Destroy the idle objects, and fail the waiters. The objects in use are
+        destroyed when returned.
+        """
+
+        with self._lock:
+            self._closed = True
+            idle = [obj for obj, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            waiters, self._waiters = self._waiters, deque()
+
+        for waiter in waiters:
+            if waiter.set_running_or_notify_cancel():
+                waiter.set_exception(RuntimeError("the pool is closed"))
+
+        for obj in idle:
+            self._destroy(obj)
+
+    def __enter__(self) -> "Pool[T]":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
@@ -1,8 +1,20 @@
+import re
+from collections.abc import Iterable, Sequence
+from dataclasses import fields, is_dataclass
+from functools import cache
+from typing import Any
+
 import libcst as cst
 import libcst.matchers
 
 
-__all__ = ["contains_outdented_comment", "transform_source"]
+__all__ = [
+    "contains_outdented_comment",
+    "tokens_from_matcher",
+    "transform_source",
+    "FusedTransformer",
+    "transform_source_pipeline",
+]
 
 
 def contains_outdented_comment(node: cst.CSTNode) -> bool:
@@ -15,9 +27,203 @@ def contains_outdented_comment(node: cst.CSTNode) -> bool:
     return bool(m.findall(node, m.EmptyLine(indent=False, comment=m.Comment())))
 
 
+def any_tokens(candidates: Iterable[frozenset[str] | None]) -> frozenset[str] | None:
+    """Pick the smallest of the token sets, each of which is required on its own"""
+
+    derived = [tokens for tokens in candidates if tokens is not None]
+    return min(derived, key=len, default=None)
+
+
+def tokens_from_matcher(matcher: object) -> frozenset[str] | None:
+    """
+    Derive from a matcher the tokens, such as identifiers, at least one of which must
+    appear in the source code for the matcher to match any node. Return `None` if they
+    can't be derived, such as for wildcards and predicates.
+
+    The result is intended for the `prefilter_tokens` of a transformer. See
+    `transform_source()`.
+
+    Usage:
+
+        ```
+        >>> tokens_from_matcher(m.Call(func=m.Name("print") | m.Name("input")))
+        frozenset({'print', 'input'})
+        ```
+    """
+
+    m = libcst.matchers
+
+    if isinstance(matcher, str):
+        return frozenset([matcher]) if matcher else None
+
+    if isinstance(matcher, m.OneOf):
+        options = [tokens_from_matcher(option) for option in matcher.options]
+        if any(tokens is None for tokens in options):
+            return None
+        return frozenset().union(*options)  # type: ignore
+
+    if isinstance(matcher, m.AllOf):
+        return any_tokens(tokens_from_matcher(option) for option in matcher.options)
+
+    # The node matches only if all of its fields match
+    if isinstance(matcher, m.BaseMatcherNode) and is_dataclass(matcher):
+        return any_tokens(
+            tokens_from_matcher(getattr(matcher, field.name))
+            for field in fields(matcher)
+        )
+
+    if isinstance(matcher, (list, tuple)):
+        return any_tokens(tokens_from_matcher(element) for element in matcher)
+
+    return None
+
+
+@cache
+def token_pattern(tokens: frozenset[str]) -> re.Pattern[str]:
+
+    # Match identifiers as whole words, and try longer tokens first
+    alternatives = (
+        rf"\b{re.escape(token)}\b" if token.isidentifier() else re.escape(token)
+        for token in sorted(tokens, key=len, reverse=True)
+    )
+    return re.compile("|".join(alternatives))
+
+
+def may_transform(transformer: cst.CSTTransformer, source: str) -> bool:
+    """Return `True` unless the prefilter tokens of the transformer rule it out"""
+
+    tokens = getattr(transformer, "prefilter_tokens", None)
+    if tokens is None:
+        return True
+
+    tokens = frozenset(tokens)
+    return bool(tokens) and token_pattern(tokens).search(source) is not None
+
+
 def transform_source(transformer: cst.CSTTransformer, source: str) -> str:
-    """Transform the source code with the cst node transformer"""
+    """
+    Transform the source code with the cst node transformer.
+
+    The transformer can declare a `prefilter_tokens` attribute, as a collection of
+    tokens at least one of which must appear in the source code for the transformer
+    to change anything. The source code is then returned as is, without being parsed,
+    if none of them appear. Identifiers are matched as whole words, while other tokens
+    as substrings. `tokens_from_matcher()` helps to derive the tokens.
+    """
+
+    if not may_transform(transformer, source):
+        return source
 
     module = cst.parse_module(source)
     new_module = module.visit(transformer)
     return new_module.code
+
+
+class FusedTransformer(cst.CSTTransformer):
+    """
+    Run multiple cst node transformers in a single traversal of the tree.
+
+    At each node, the `on_visit` hooks are called in order, and the `on_leave` hooks
+    are then chained in order, such that each transformer receives the node updated by
+    the previous ones. Fusing is only equivalent to applying the transformers one by
+    one if they are independent, i.e. no transformer depends on the changes made by
+    another one to the ancestors or descendants of a node.
+
+    A transformer skipping the children of a node by returning `False` from `on_visit`
+    skips them on its own. Removing a node, or replacing it with multiple nodes, stops
+    the chain for that node. Transformers depending on metadata are not supported.
+    """
+
+    def __init__(self, transformers: Sequence[cst.CSTTransformer]) -> None:
+
+        super().__init__()
+
+        for transformer in transformers:
+            if transformer.get_inherited_dependencies():
+                name = type(transformer).__name__
+                raise ValueError(f"{name} depends on metadata, and can't be fused")
+
+        self.transformers = list(transformers)
+        # The node whose children each transformer is skipping, if any
+        self._skipping: list[cst.CSTNode | None] = [None] * len(self.transformers)
+
+        token_sets = [getattr(t, "prefilter_tokens", None) for t in transformers]
+        if all(tokens is not None for tokens in token_sets):
+            self.prefilter_tokens = frozenset().union(*token_sets)  # type: ignore
+
+    def on_visit(self, node: cst.CSTNode) -> bool:
+
+        skipping = self._skipping
+        visit_children = False
+
+        for index, transformer in enumerate(self.transformers):
+            if skipping[index] is not None:
+                continue
+            if transformer.on_visit(node):
+                visit_children = True
+            else:
+                skipping[index] = node
+
+        return visit_children
+
+    def on_visit_attribute(self, node: cst.CSTNode, attribute: str) -> None:
+        for transformer, skipped in zip(self.transformers, self._skipping):
+            if skipped is None:
+                transformer.on_visit_attribute(node, attribute)
+
+    def on_leave_attribute(self, original_node: cst.CSTNode, attribute: str) -> None:
+        for transformer, skipped in zip(self.transformers, self._skipping):
+            if skipped is None:
+                transformer.on_leave_attribute(original_node, attribute)
+
+    def on_leave(self, original_node: cst.CSTNode, updated_node: cst.CSTNode) -> Any:
+
+        skipping = self._skipping
+        result: Any = updated_node
+
+        for index, transformer in enumerate(self.transformers):
+
+            skipped = skipping[index]
+            if skipped is not None and skipped is not original_node:
+                continue
+            skipping[index] = None
+
+            if isinstance(result, cst.CSTNode):
+                result = transformer.on_leave(original_node, result)
+
+        return result
+
+
+def transform_source_pipeline(
+    transformers: Sequence[cst.CSTTransformer], source: str, *, fuse: bool = False
+) -> str:
+    """
+    Transform the source code with the cst node transformers in order, like calling
+    `transform_source()` for each of them, but parse the source code only once, and
+    serialize it only once at the end.
+
+    If `fuse` is true, the transformers are run in a single traversal of the tree,
+    which requires them to be independent. See `FusedTransformer`.
+
+    Leading transformers are skipped if ruled out by their `prefilter_tokens`. See
+    `transform_source()`.
+    """
+
+    # Only leading transformers can be prefiltered on the original source code, as the
+    # later ones may see tokens introduced by earlier ones.
+    transformers = list(transformers)
+    while transformers and not may_transform(transformers[0], source):
+        del transformers[0]
+
+    if not transformers:
+        return source
+
+    module = cst.parse_module(source)
+
+    if fuse:
+        module = module.visit(FusedTransformer(transformers))
+    else:
+        for transformer in transformers:
+            module = module.visit(transformer)
+
+    return module.code
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
-import asyncio
 import inspect
+import sys
+import threading
+import time
 import types
-from collections.abc import Callable
+import weakref
+from collections import OrderedDict, defaultdict, deque
+from collections.abc import Callable, Generator, Hashable, Iterable
 from functools import partial, wraps
-from inspect import Parameter, isasyncgenfunction
+from inspect import Parameter, Signature, iscoroutinefunction
 from typing import (
+    TYPE_CHECKING,
     Any,
     Awaitable,
     Concatenate,
+    Generic,
+    Literal,
+    NamedTuple,
     NoReturn,
     ParamSpec,
     Protocol,
@@ -18,23 +26,38 @@ from typing import (
     overload,
 )
 
-from lazy_object_proxy import Proxy
-from typing_extensions import Self
-
 from .monoids import Monoid
 from .typing import K0Callable, P1Callable, P1K0Callable, PNCallable, PNK0Callable
 
 
+if TYPE_CHECKING:
+    import asyncio
+
+    from typing_extensions import Self
+
+
 __all__ = [
     "noop",
     "raiser",
     "async_def",
     "lazy_call",
+    "Lazy",
+    "AsyncLazy",
+    "lazy_acall",
+    "force",
     "nulldecorator",
     "inject_pre_hook",
     "inject_post_hook",
+    "HookSet",
+    "hookable",
+    "get_hooks",
     "curry",
     "mapreduce",
+    "CacheInfo",
+    "Cache",
+    "memoize",
+    "memoize_method",
+    "singleflight",
 ]
 
 
@@ -89,10 +112,143 @@ def lazy_call(func: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
     Call a function lazily.
 
     The return value is lazily evaluated. The actual function execution is delayed until
-    the return value is acutally used by the external code.
+    the return value is acutally used by the external code. The function is executed at
+    most once, even if the return value is first used by multiple threads concurrently.
+
+    Every operation on the return value goes through a proxy. Use `force()` to get the
+    underlying value, or use `Lazy` instead where explicit evaluation is acceptable.
+    """
+
+    from lazy_object_proxy import Proxy
+
+    return cast(R, Proxy(Lazy(func, *args, **kwargs).get))
+
+
+# A sentinel to denote a lazy value not yet evaluated
+UNEVALUATED: Any = object()
+
+
+class Lazy(Generic[R]):
+    """
+    A lazily evaluated value, which calls the function on first `get()` and caches the
+    result. The function is called exactly once, even under concurrent `get()` from
+    multiple threads. If the function raises, the exception propagates, and the next
+    `get()` tries again.
+
+    Unlike `lazy_call()`, accessing the value after evaluation involves no proxy, just a
+    method call, and the caller can keep the plain value returned by `get()`.
+
+    Usage:
+
+        ```
+        config = Lazy(load_config, path)
+        ...
+        config.get()["key"]
+        ```
+    """
+
+    __slots__ = ("_func", "_value", "_lock")
+
+    def __init__(self, func: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> None:
+        self._func: Callable[[], R] | None = (
+            partial(func, *args, **kwargs) if args or kwargs else func
+        )
+        self._value: R = UNEVALUATED
+        self._lock = threading.Lock()
+
+    def get(self) -> R:
+        """Return the value, evaluating it if not evaluated yet"""
+
+        value = self._value
+        if value is UNEVALUATED:
+            value = self._evaluate()
+        return value
+
+    def _evaluate(self) -> R:
+
+        with self._lock:
+            # Double-checked locking
+            if self._value is UNEVALUATED:
+                assert self._func is not None
+                self._value = self._func()
+                # Release the references held by the function
+                self._func = None
+
+        return self._value
+
+    @property
+    def evaluated(self) -> bool:
+        return self._value is not UNEVALUATED
+
+    def __repr__(self) -> str:
+        if self.evaluated:
+            return f"Lazy({self._value!r})"
+        else:
+            return "Lazy(<unevaluated>)"
+
+
+class AsyncLazy(Generic[R]):
+    """
+    A lazily evaluated value produced by a coroutine function, which is awaited on the
+    first `await` of the lazy value. All awaits, including concurrent ones, share the
+    single evaluation and its result or exception. Cancelling one await doesn't cancel
+    the shared evaluation.
+
+    The evaluation runs as a task of the event loop where it's first awaited.
+    """
+
+    __slots__ = ("_func", "_future")
+
+    def __init__(self, func: Callable[[], Awaitable[R]]) -> None:
+        self._func: Callable[[], Awaitable[R]] | None = func
+        self._future: asyncio.Future[R] | None = None
+
+    def __await__(self) -> Generator[Any, None, R]:
+
+        import asyncio
+
+        if self._future is None:
+            assert self._func is not None
+            self._future = asyncio.ensure_future(self._func())
+            self._func = None
+
+        if self._future.done():
+            return self._future.result()
+
+        return (yield from asyncio.shield(self._future).__await__())
+
+    @property
+    def evaluated(self) -> bool:
+        return self._future is not None and self._future.done()
+
+
+def lazy_acall(
+    func: Callable[P, Awaitable[R]], *args: P.args, **kwargs: P.kwargs
+) -> AsyncLazy[R]:
+    """
+    Call an async function lazily. The returned lazy value can be awaited any number of
+    times, while the async function is called at most once, on the first await.
+    """
+
+    return AsyncLazy(partial(func, *args, **kwargs))
+
+
+def force(value: R) -> R:
+    """
+    Return the underlying value of a `Lazy` or of a lazy value returned by
+    `lazy_call()`, evaluating it if not evaluated yet. Other objects are returned
+    unchanged.
     """
 
-    return cast(R, Proxy(partial(func, *args, **kwargs)))
+    if isinstance(value, Lazy):
+        return value.get()
+
+    # If lazy_object_proxy hasn't been imported, the value can't be a proxy
+    lazy_object_proxy = sys.modules.get("lazy_object_proxy")
+    if lazy_object_proxy is not None and isinstance(value, lazy_object_proxy.Proxy):
+        return value.__wrapped__
+
+    return value
 
 
 # TODO update the type annotation to reflect the fact that nulldecorator can also be
@@ -109,28 +265,254 @@ def nulldecorator(func: Callable[P, R]) -> Callable[P, R]:
     return func
 
 
-def inject_pre_hook(prehook: Callable[P, None], func: Callable[P, R]) -> Callable[P, R]:
-    """Inject pre hook into a function"""
+class HookSet:
+    """
+    The pre hooks and post hooks of a hookable function, which can be modified at
+    runtime. Pre hooks are called with the arguments before the function call. Post
+    hooks are called with the result followed by the arguments after the function call,
+    and their return value replaces the result.
+
+    The hookable function mirrors the signature of the function when available, in which
+    case the hooks receive the arguments bound to the parameters, with the defaults
+    filled in and the positional-or-keyword arguments passed positionally.
+    """
 
-    @wraps(func)
-    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
-        prehook(*args, **kwargs)
-        return func(*args, **kwargs)
+    __slots__ = ("func", "pre_hooks", "post_hooks", "enabled", "active", "_wrappers")
+
+    def __init__(
+        self,
+        func: Callable[..., Any],
+        pre_hooks: Iterable[Callable[..., None]] = (),
+        post_hooks: Iterable[Callable[..., Any]] = (),
+    ) -> None:
+        self.func = func
+        self.pre_hooks = list(pre_hooks)
+        self.post_hooks = list(post_hooks)
+        self.enabled = True
+        self._wrappers: weakref.WeakSet[Callable[..., Any]] = weakref.WeakSet()
+        self._update()
+
+    def _update(self) -> None:
+        self.active = self.enabled and bool(self.pre_hooks or self.post_hooks)
+
+        # Rebuild the hookable functions, so that they don't check for the hooks on
+        # each call
+        for wrapper in self._wrappers:
+            specialize_wrapper(wrapper, self)
+
+    def add_pre_hook(self, hook: Callable[..., None], *, first: bool = False) -> None:
+        if first:
+            self.pre_hooks.insert(0, hook)
+        else:
+            self.pre_hooks.append(hook)
+        self._update()
+
+    def remove_pre_hook(self, hook: Callable[..., None]) -> None:
+        self.pre_hooks.remove(hook)
+        self._update()
+
+    def add_post_hook(self, hook: Callable[..., Any]) -> None:
+        self.post_hooks.append(hook)
+        self._update()
+
+    def remove_post_hook(self, hook: Callable[..., Any]) -> None:
+        self.post_hooks.remove(hook)
+        self._update()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self._update()
+
+    def disable(self) -> None:
+        self.enabled = False
+        self._update()
+
+
+# Map hookable functions to their hook sets
+HOOK_REGISTRY: weakref.WeakKeyDictionary[Callable[..., Any], HookSet] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def hookable(func: Callable[P, R]) -> Callable[P, R]:
+    """
+    Wrap the function in a single flat wrapper that runs the hooks registered in its
+    `HookSet`, which is retrievable with `get_hooks()`. Hooks can be added and removed
+    at runtime without re-wrapping. The wrapper costs little more than a direct call
+    when there are no hooks or the hook set is disabled.
+    """
+
+    return wrap_with_hooks(HookSet(func))
+
+
+class Placeholder:
+    """An object whose repr is the given source code"""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+
+    def __repr__(self) -> str:
+        return self.source
+
+
+def forwarding_signature(func: Callable[..., Any]) -> tuple[str, str, dict[str, Any]]:
+    """
+    Return the parameter list and the argument list of a wrapper forwarding its
+    arguments to the function, along with the default values of the parameters.
+
+    The wrapper mirrors the signature of the function when available, which saves
+    packing the arguments into a tuple and a dict on each call.
+    """
+
+    fallback = ("*args, **kwargs", "*args, **kwargs", {})
+
+    try:
+        signature = inspect.signature(func, follow_wrapped=False)
+    except (TypeError, ValueError):
+        return fallback
+
+    params = []
+    args = []
+    defaults = {}
+
+    for param in signature.parameters.values():
+        name = param.name
+
+        # Avoid clashes with the names of the generated code
+        if name.startswith("__"):
+            return fallback
+
+        if param.default is not Parameter.empty:
+            default_name = f"__default_{len(defaults)}"
+            defaults[default_name] = param.default
+            param = param.replace(default=Placeholder(default_name))
+
+        params.append(param.replace(annotation=Parameter.empty))
+
+        if param.kind is Parameter.VAR_POSITIONAL:
+            args.append("*" + name)
+        elif param.kind is Parameter.KEYWORD_ONLY:
+            args.append(f"{name}={name}")
+        elif param.kind is Parameter.VAR_KEYWORD:
+            args.append("**" + name)
+        else:
+            args.append(name)
+
+    signature = signature.replace(parameters=params, return_annotation=Signature.empty)
+    return str(signature)[1:-1], ", ".join(args), defaults
+
+
+def hooked_function_source(
+    params: str, args: str, pre_hook_count: int, post_hook_count: int
+) -> str:
+    """Generate the source code of a hookable function with the hooks unrolled"""
+
+    lines = [f"def wrapper({params}):"]
 
+    lines += [f"    __pre_{i}({args})" for i in range(pre_hook_count)]
+
+    if post_hook_count:
+        lines.append(f"    __result = __func({args})")
+        lines += [
+            f"    __result = __post_{i}(__result, {args})"
+            for i in range(post_hook_count)
+        ]
+        lines.append("    return __result")
+    else:
+        lines.append(f"    return __func({args})")
+
+    return "\n".join(lines)
+
+
+def compile_wrapper(
+    namespace: dict[str, Any], hooks: HookSet, params: str, args: str
+) -> Callable[..., Any]:
+
+    pre_hooks = hooks.pre_hooks if hooks.enabled else []
+    post_hooks = hooks.post_hooks if hooks.enabled else []
+
+    # Old names are overwritten but never deleted, so that calls running concurrently
+    # with the rebuild don't fail
+    for i, hook in enumerate(pre_hooks):
+        namespace[f"__pre_{i}"] = hook
+    for i, hook in enumerate(post_hooks):
+        namespace[f"__post_{i}"] = hook
+
+    source = hooked_function_source(params, args, len(pre_hooks), len(post_hooks))
+    filename = f"<hookable {getattr(hooks.func, '__qualname__', hooks.func)!r}>"
+    exec(compile(source, filename, "exec"), namespace)
+    return namespace.pop("wrapper")
+
+
+def specialize_wrapper(wrapper: Callable[..., Any], hooks: HookSet) -> None:
+    """Rebuild the hookable function in place for the current hooks"""
+
+    namespace = wrapper.__globals__  # type: ignore
+    params, args = namespace["__signature__"]
+    specialized = compile_wrapper(namespace, hooks, params, args)
+    wrapper.__code__ = specialized.__code__  # type: ignore
+
+
+def wrap_with_hooks(hooks: HookSet) -> Callable[..., Any]:
+
+    # The generated code calls the function and the hooks directly, with no loop and
+    # no check, and is regenerated whenever the hooks change. Each hookable function
+    # has its own globals namespace, so that its code can be swapped in place.
+
+    params, args, defaults = forwarding_signature(hooks.func)
+    namespace = {"__func": hooks.func, "__signature__": (params, args), **defaults}
+
+    wrapper = wraps(hooks.func)(compile_wrapper(namespace, hooks, params, args))
+
+    hooks._wrappers.add(wrapper)
+    HOOK_REGISTRY[wrapper] = hooks
     return wrapper
 
 
+def get_hooks(func: Callable[..., Any]) -> HookSet:
+    """Return the hook set of a hookable function. Raise `ValueError` if not hookable."""
+
+    try:
+        return HOOK_REGISTRY[func]
+    except (KeyError, TypeError):
+        raise ValueError(f"{func} is not a hookable function") from None
+
+
+def copy_hooks(func: Callable[..., Any]) -> HookSet:
+    """
+    Return a copy of the hook set if the function is hookable, otherwise return an empty
+    hook set for the function.
+    """
+
+    try:
+        hooks = HOOK_REGISTRY[func]
+    except (KeyError, TypeError):
+        return HookSet(func)
+    else:
+        return HookSet(hooks.func, hooks.pre_hooks, hooks.post_hooks)
+
+
+# Injecting hooks into a hookable function creates a new hookable function with the
+# hooks fused into a single flat wrapper, instead of stacking wrapper upon wrapper,
+# which would multiply call overhead and deepen stack traces.
+
+
+def inject_pre_hook(prehook: Callable[P, None], func: Callable[P, R]) -> Callable[P, R]:
+    """Inject pre hook into a function"""
+
+    hooks = copy_hooks(func)
+    hooks.add_pre_hook(prehook, first=True)
+    return wrap_with_hooks(hooks)
+
+
 def inject_post_hook(
     posthook: Callable[Concatenate[R, P], R2], func: Callable[P, R]
 ) -> Callable[P, R2]:
     """Inject post hook into a function"""
 
-    @wraps(func)
-    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R2:
-        result = func(*args, **kwargs)
-        return posthook(result, *args, **kwargs)
-
-    return wrapper
+    hooks = copy_hooks(func)
+    hooks.add_post_hook(posthook)
+    return wrap_with_hooks(hooks)
 
 
 def is_positional_parameter(param: Parameter) -> bool:
@@ -210,9 +592,11 @@ def _mapreduce(
 ) -> PNCallable[T, S, R | Awaitable[R]]:
     """Transform a function that returns monoid such that it can receive an iterable of input"""
 
-    if isasyncgenfunction(func):
+    if iscoroutinefunction(func):
         async_func = cast(P1Callable[T, S, Awaitable[R]], func)
 
+        import asyncio
+
         @wraps(func)
         async def async_wrapper(*xs: T, **kwargs: S) -> R:
             coros = (async_func(x, **kwargs) for x in xs)
@@ -262,3 +646,515 @@ class mapreduce_return_type(Protocol[R]):
 
 def mapreduce(monoid: Monoid[R]) -> mapreduce_return_type[R]:
     return cast(mapreduce_return_type[R], _mapreduce(monoid))
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int | None
+    currsize: int
+    currbytes: int
+
+
+class LRUOrder:
+    """Track the least recently used key"""
+
+    def __init__(self) -> None:
+        self._keys: OrderedDict[Hashable, None] = OrderedDict()
+
+    def add(self, key: Hashable) -> None:
+        self._keys[key] = None
+
+    def touch(self, key: Hashable, count: int = 1) -> None:
+        self._keys.move_to_end(key)
+
+    def remove(self, key: Hashable) -> None:
+        del self._keys[key]
+
+    def victim(self) -> Hashable:
+        return next(iter(self._keys))
+
+    def clear(self) -> None:
+        self._keys.clear()
+
+
+class LFUOrder:
+    """Track the least frequently used key, breaking ties by least recent use"""
+
+    # Reference: "An O(1) algorithm for implementing the LFU cache eviction scheme"
+    # http://dhruvbird.com/lfu.pdf
+
+    def __init__(self) -> None:
+        self._freqs: dict[Hashable, int] = {}
+        self._buckets: defaultdict[int, OrderedDict[Hashable, None]] = defaultdict(
+            OrderedDict
+        )
+        self._min_freq = 0
+
+    def add(self, key: Hashable) -> None:
+        self._freqs[key] = 1
+        self._buckets[1][key] = None
+        self._min_freq = 1
+
+    def touch(self, key: Hashable, count: int = 1) -> None:
+        freq = self._freqs[key]
+        self._unlink(key, freq)
+        self._freqs[key] = freq + count
+        self._buckets[freq + count][key] = None
+
+    def remove(self, key: Hashable) -> None:
+        self._unlink(key, self._freqs.pop(key))
+
+    def _unlink(self, key: Hashable, freq: int) -> None:
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if self._min_freq == freq:
+                self._min_freq = freq + 1
+
+    def victim(self) -> Hashable:
+        # The minimum frequency could be stale after removals, so search upwards
+        while self._min_freq not in self._buckets:
+            self._min_freq += 1
+        return next(iter(self._buckets[self._min_freq]))
+
+    def clear(self) -> None:
+        self._freqs.clear()
+        self._buckets.clear()
+        self._min_freq = 0
+
+
+EVICTION_POLICIES = {"lru": LRUOrder, "lfu": LFUOrder}
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+
+
+# A sentinel to denote cache miss
+MISSING: Any = object()
+
+
+# The number of hits buffered before they are replayed into the eviction policy
+READ_BUFFER_SIZE = 64
+
+
+class Cache:
+    """
+    A thread-safe key-value cache, bounded by the number of entries and optionally by
+    the total size of values, under the LRU or LFU eviction policy.
+
+    If `ttl` is specified, entries expire `ttl` seconds after insertion. Values are
+    measured by the `sizer` function, only if `maxbytes` is specified.
+
+    Hits don't take the lock. They are recorded in a buffer, which is replayed into the
+    eviction policy and the statistics in batches, and before any eviction.
+    """
+
+    def __init__(
+        self,
+        maxsize: int | None = 128,
+        *,
+        policy: Literal["lru", "lfu"] = "lru",
+        ttl: float | None = None,
+        maxbytes: int | None = None,
+        sizer: Callable[[Any], int] = sys.getsizeof,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"unknown eviction policy: {policy!r}")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizer = sizer
+        self.timer = timer
+
+        self._entries: dict[Hashable, CacheEntry] = {}
+        self._order = EVICTION_POLICIES[policy]()
+        self._reads: deque[Hashable] = deque()
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = self._currbytes = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value of the key if present, else return `default`"""
+
+        # Fast path. Dict lookups and deque appends are atomic.
+        entry = self._entries.get(key)
+        if entry is not None and (self.ttl is None or entry.expires_at > self.timer()):
+            reads = self._reads
+            reads.append(key)
+            # Don't wait for the lock, the next put will replay the hits anyway
+            if len(reads) >= READ_BUFFER_SIZE and self._lock.acquire(blocking=False):
+                try:
+                    self._replay_reads()
+                finally:
+                    self._lock.release()
+            return entry.value
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self._misses += 1
+                return default
+
+            if self.ttl is not None and entry.expires_at <= self.timer():
+                self._remove(key)
+                self._evictions += 1
+                self._misses += 1
+                return default
+
+            # The entry was inserted concurrently
+            self._order.touch(key)
+            self._hits += 1
+            return entry.value
+
+    def _replay_reads(self) -> None:
+        reads = self._reads
+        count = len(reads)
+        if not count:
+            return
+
+        # Count the hits per key, in the order of their last hit, so that each key is
+        # touched once
+        counts: dict[Hashable, int] = {}
+        for _ in range(count):
+            key = reads.popleft()
+            counts[key] = counts.pop(key, 0) + 1
+
+        self._hits += count
+
+        entries = self._entries
+        touch = self._order.touch
+        for key, count in counts.items():
+            # The entry may have been removed since
+            if key in entries:
+                touch(key, count)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Cache the value of the key, evicting other entries if necessary"""
+
+        size = self.sizer(value) if self.maxbytes is not None else 0
+        expires_at = self.timer() + self.ttl if self.ttl is not None else 0
+
+        with self._lock:
+            self._replay_reads()
+
+            if key in self._entries:
+                self._remove(key)
+
+            if self.maxsize == 0 or (
+                self.maxbytes is not None and size > self.maxbytes
+            ):
+                return
+
+            # Evict before inserting, otherwise the LFU policy would evict the new entry
+            while (self.maxsize is not None and len(self._entries) >= self.maxsize) or (
+                self.maxbytes is not None and self._currbytes + size > self.maxbytes
+            ):
+                self._remove(self._order.victim())
+                self._evictions += 1
+
+            self._entries[key] = CacheEntry(value, size, expires_at)
+            self._order.add(key)
+            self._currbytes += size
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._order.remove(key)
+        self._currbytes -= entry.size
+
+    def clear(self) -> None:
+        """Remove all entries, and reset the statistics"""
+
+        with self._lock:
+            self._entries.clear()
+            self._order.clear()
+            self._reads.clear()
+            self._hits = self._misses = self._evictions = self._currbytes = 0
+
+    def info(self) -> CacheInfo:
+        """Report the cache statistics"""
+
+        with self._lock:
+            self._replay_reads()
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                self.maxsize,
+                len(self._entries),
+                self._currbytes,
+            )
+
+
+# A sentinel to separate positional arguments from keyword arguments in cache keys
+KWD_MARK = object()
+
+
+def make_key(args: tuple, kwargs: dict[str, Any], typed: bool) -> Hashable:
+    """Make a cache key out of call arguments, similar to what `lru_cache` does"""
+
+    # Flatten the keyword arguments, which is cheaper to build and to hash
+    key = args
+    if kwargs:
+        key += (KWD_MARK,)
+        for item in kwargs.items():
+            key += item
+    if typed:
+        key += tuple(map(type, args))
+        if kwargs:
+            key += tuple(map(type, kwargs.values()))
+    elif len(key) == 1 and type(key[0]) in (int, str):
+        return key[0]
+    return key
+
+
+@overload
+def memoize(
+    maxsize: int | None = 128,
+    *,
+    policy: Literal["lru", "lfu"] = "lru",
+    ttl: float | None = None,
+    maxbytes: int | None = None,
+    sizer: Callable[[Any], int] = sys.getsizeof,
+    typed: bool = False,
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    ...
+
+
+@overload
+def memoize(maxsize: Callable[P, R]) -> Callable[P, R]:
+    ...
+
+
+def memoize(
+    maxsize: int | None | Callable[P, R] = 128,
+    *,
+    policy: Literal["lru", "lfu"] = "lru",
+    ttl: float | None = None,
+    maxbytes: int | None = None,
+    sizer: Callable[[Any], int] = sys.getsizeof,
+    typed: bool = False,
+) -> Callable[[Callable[P, R]], Callable[P, R]] | Callable[P, R]:
+    """
+    Similar to `functools.lru_cache`, but with a choice of eviction policy (`"lru"` or
+    `"lfu"`), optional time-to-live of entries, and optional budget of the total size of
+    cached values, measured by the `sizer` function.
+
+    The decorated function exposes the underlying `Cache` as the `cache` attribute, as
+    well as `cache_info()` and `cache_clear()`. The cache is thread-safe, and the lock
+    is not held while calling the decorated function, so concurrent misses of the same
+    key may call the function more than once.
+
+    Usage:
+
+        ```
+        @memoize(maxsize=1024, policy="lfu", ttl=60)
+        def fetch(url):
+            ...
+        ```
+    """
+
+    if callable(maxsize):
+        return memoize()(maxsize)
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+
+        cache = Cache(
+            maxsize, policy=policy, ttl=ttl, maxbytes=maxbytes, sizer=sizer
+        )
+
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+
+            key = make_key(args, kwargs, typed)
+
+            result = cache.get(key, MISSING)
+            if result is MISSING:
+                result = func(*args, **kwargs)
+                cache.put(key, result)
+
+            return result
+
+        wrapper.cache = cache  # type: ignore
+        wrapper.cache_info = cache.info  # type: ignore
+        wrapper.cache_clear = cache.clear  # type: ignore
+
+        return wrapper
+
+    return decorator
+
+
+class MemoizedMethod(Generic[R]):
+    """
+    A descriptor that gives each instance its own cache of the method. See
+    `memoize_method()` for more details.
+    """
+
+    def __init__(self, func: Callable[..., R], options: dict[str, Any]) -> None:
+        self.func = func
+        self.options = options
+        self.attrname: str | None = None
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.attrname = name
+
+    def __get__(self, instance: object, owner: type | None = None) -> Any:
+
+        if instance is None:
+            return self
+
+        if self.attrname is None:
+            raise TypeError(
+                "cannot use memoized method without calling __set_name__ on it"
+            )
+
+        # Hold the instance weakly to avoid a reference cycle between the instance and
+        # its cache.
+        ref = weakref.ref(instance)
+        func = self.func
+
+        @memoize(**self.options)
+        @wraps(func)
+        def method(*args: Any, **kwargs: Any) -> R:
+            return func(ref(), *args, **kwargs)
+
+        # Like `functools.cached_property`, store the memoized method in the instance
+        # dict, so that subsequent lookups bypass the descriptor. Use `setdefault()` in
+        # case another thread wins the race.
+        return instance.__dict__.setdefault(self.attrname, method)
+
+
+@overload
+def memoize_method(
+    func: None = None,
+    *,
+    maxsize: int | None = 128,
+    policy: Literal["lru", "lfu"] = "lru",
+    ttl: float | None = None,
+    maxbytes: int | None = None,
+    sizer: Callable[[Any], int] = sys.getsizeof,
+    typed: bool = False,
+) -> Callable[[Callable[..., R]], MemoizedMethod[R]]:
+    ...
+
+
+@overload
+def memoize_method(func: Callable[..., R]) -> MemoizedMethod[R]:
+    ...
+
+
+def memoize_method(
+    func: Callable[..., R] | None = None, **options: Any
+) -> MemoizedMethod[R] | Callable[[Callable[..., R]], MemoizedMethod[R]]:
+    """
+    Similar to `memoize()`, but for methods. Each instance gets its own cache, which is
+    freed along with the instance, instead of a cache shared by all instances that
+    keeps every instance alive.
+
+    The instance should have a `__dict__` and support weak references.
+    """
+
+    if func is None:
+        return lambda func: MemoizedMethod(func, options)
+
+    return MemoizedMethod(func, options)
+
+
+class InFlightCall:
+    """The shared state of an in-flight call of a single-flight function"""
+
+    __slots__ = ("done", "result", "exception")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.exception: BaseException | None = None
+
+
+@overload
+def singleflight(
+    func: None = None, *, retain: float = 0, typed: bool = False
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    ...
+
+
+@overload
+def singleflight(func: Callable[P, R]) -> Callable[P, R]:
+    ...
+
+
+def singleflight(
+    func: Callable[P, R] | None = None, *, retain: float = 0, typed: bool = False
+) -> Callable[P, R] | Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    Coalesce concurrent calls with the same arguments from multiple threads, such that
+    only the first call executes the function, and the other calls wait for and share
+    its result or exception.
+
+    If `retain` is positive, successful results are additionally shared with calls
+    arriving within `retain` seconds after completion. See `asingleflight()` in
+    `recipes.asyncio` for the asyncio counterpart.
+    """
+
+    if func is None:
+        return partial(singleflight, retain=retain, typed=typed)
+
+    calls: dict[Hashable, InFlightCall] = {}
+    # Retained calls in order of expiration, which is also the order of completion
+    retained: deque[tuple[float, Hashable, InFlightCall]] = deque()
+    lock = threading.Lock()
+
+    def expire() -> None:
+        now = time.monotonic()
+        while retained and retained[0][0] <= now:
+            _, key, call = retained.popleft()
+            if calls.get(key) is call:
+                del calls[key]
+
+    @wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+
+        key = make_key(args, kwargs, typed)
+
+        with lock:
+            if retained:
+                expire()
+
+            call = calls.get(key)
+            leader = call is None
+            if leader:
+                call = calls[key] = InFlightCall()
+
+        assert call is not None
+
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as exc:
+            call.exception = exc
+            raise
+        finally:
+            with lock:
+                if retain > 0 and call.exception is None:
+                    retained.append((time.monotonic() + retain, key, call))
+                else:
+                    del calls[key]
+            call.done.set()
+
+        return call.result
+
+    return wrapper
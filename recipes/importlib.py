@@ -1,11 +1,12 @@
 import importlib
 import importlib.util
+import sys
+from collections.abc import Callable
 from types import ModuleType
+from typing import Any
 
-from .functools import lazy_call
 
-
-__all__ = ["importable", "lazy_import_module"]
+__all__ = ["importable", "lazy_import_module", "lazy_import_from"]
 
 
 def importable(module: str) -> bool:
@@ -16,8 +17,82 @@ def importable(module: str) -> bool:
     return importlib.util.find_spec(module) is not None
 
 
-# Refer to the comments of `lazy_call()` for explanation of the type annotation design.
 def lazy_import_module(name: str, package: str = None) -> ModuleType:
-    """Lazy version of `importlib.import_module()`"""
+    """
+    Lazy version of `importlib.import_module()`.
+
+    The returned module is a real module object inserted into `sys.modules`, whose
+    execution is deferred until its first attribute access, after which it behaves as a
+    plain module, with no extra overhead.
+
+    Raise `ModuleNotFoundError` if the module can't be found. Note that the parent
+    packages of a submodule are imported eagerly.
+    """
+
+    # Reference: https://docs.python.org/3/library/importlib.html#implementing-lazy-imports
+
+    absname = importlib.util.resolve_name(name, package)
+
+    try:
+        return sys.modules[absname]
+    except KeyError:
+        pass
+
+    spec = importlib.util.find_spec(absname)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named {absname!r}", name=absname)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[absname] = module
+    loader.exec_module(module)
+
+    # Mimic the import system, which binds a submodule to its parent package
+    parent, _, child = absname.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+
+    return module
+
+
+def lazy_import_from(
+    module: str, *names: str, package: str = None
+) -> Callable[[str], Any]:
+    """
+    Lazy version of `from module import names`.
+
+    Return a function intended to be assigned to the module-level `__getattr__` of the
+    caller's module, so that the names are imported on their first access as attributes
+    of the caller's module. The imported values are then cached in the caller's module
+    globals, so that later accesses cost the same as normal attribute accesses.
+
+    Multiple calls can be chained, as each falls back to the previously assigned
+    module-level `__getattr__`.
+
+    Usage:
+
+        ```
+        __getattr__ = lazy_import_from("json", "dumps", "loads")
+        __getattr__ = lazy_import_from("shutil", "rmtree")
+        ```
+    """
+
+    namespace = sys._getframe(1).f_globals
+    fallback = namespace.get("__getattr__")
+    lazy_names = frozenset(names)
+
+    def __getattr__(name: str) -> Any:
+
+        if name not in lazy_names:
+            if fallback is not None:
+                return fallback(name)
+            raise AttributeError(
+                f"module {namespace['__name__']!r} has no attribute {name!r}"
+            )
+
+        value = getattr(importlib.import_module(module, package), name)
+        namespace[name] = value
+        return value
 
-    return lazy_call(importlib.import_module, name, package)
+    return __getattr__
@@ -6,13 +6,7 @@ from inspect import Parameter
 from types import FrameType, FunctionType, LambdaType, MethodType
 from typing import Any, ParamSpec
 
-import libcst as cst
-import libcst.matchers
-from libcst.metadata import PositionProvider
-from more_itertools import one
-
 from .builtins import ensure_type, read_text
-from .cst import contains_outdented_comment
 from .exceptions import OutdentedCommentError
 from .sourcelib import unindent_source
 
@@ -61,6 +55,13 @@ def get_function_body_source(func: Callable) -> str:
     if not isinstance(func, (FunctionType, LambdaType, MethodType)):
         raise ValueError(f"expect a user-defined function, got {func}")
 
+    import libcst as cst
+    import libcst.matchers
+    from libcst.metadata import PositionProvider
+    from more_itertools import one
+
+    from .cst import contains_outdented_comment
+
     source = getsourcefilesource(func)
 
     module = cst.parse_module(source)
@@ -115,6 +116,8 @@ def bind_arguments(
 def get_frame_curr_line(frame: FrameType) -> str | None:
     """Get the current executing source line of a given frame, or None if not found"""
 
+    from more_itertools import one
+
     frame_info = inspect.getframeinfo(frame, context=1)
     context = frame_info.code_context
     if context is None:
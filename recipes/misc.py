@@ -1,4 +1,4 @@
-from colorama import Fore, Style
+import os
 
 
 __all__ = ["bright_red", "bright_green", "bright_blue", "bright_yellow"]
@@ -12,6 +12,8 @@ def bright_red(s: str) -> str:
     if "NO_COLOR" in os.environ:
         return s
 
+    from colorama import Fore, Style
+
     return Style.BRIGHT + Fore.RED + s + Style.RESET_ALL
 
 
@@ -23,6 +25,8 @@ def bright_green(s: str) -> str:
     if "NO_COLOR" in os.environ:
         return s
 
+    from colorama import Fore, Style
+
     return Style.BRIGHT + Fore.GREEN + s + Style.RESET_ALL
 
 
@@ -34,6 +38,8 @@ def bright_blue(s: str) -> str:
     if "NO_COLOR" in os.environ:
         return s
 
+    from colorama import Fore, Style
+
     return Style.BRIGHT + Fore.BLUE + s + Style.RESET_ALL
 
 
@@ -45,5 +51,7 @@ def bright_yellow(s: str) -> str:
     if "NO_COLOR" in os.environ:
         return s
 
+    from colorama import Fore, Style
+
     return Style.BRIGHT + Fore.YELLOW + s + Style.RESET_ALL
 
@@ -1,13 +1,28 @@
+import inspect
+import threading
 from collections.abc import Callable, Iterator, Sequence
 from contextlib import AbstractContextManager, ExitStack, contextmanager
-from functools import partial
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from functools import partial, wraps
+from inspect import iscoroutinefunction
+from time import perf_counter_ns
+from types import FunctionType, ModuleType
 from typing import Any
 
-from .builtins import getattr_r, setattr_r
+from .builtins import NO_ATTR, getattr_r, setattr_r
+from .contextlib import LatencyStats, ProfileRegistry
 from .functools import inject_pre_hook as plain_inject_pre_hook
 
 
-__all__ = ["setattr", "mapattrs", "inject_pre_hook"]
+__all__ = [
+    "setattr",
+    "mapattrs",
+    "inject_pre_hook",
+    "local_setattr",
+    "local_mapattrs",
+    "instrument",
+]
 
 
 @contextmanager
@@ -41,6 +56,288 @@ def mp_inject_pre_hook(
     return mp_mapattrs(partial(plain_inject_pre_hook, pre), obj, methods)
 
 
+class ContextLocalAttribute:
+    """
+    A descriptor installed on a class in place of an attribute, which resolves to the
+    value patched in the current context, or to the original value if not patched.
+    """
+
+    __slots__ = ("name", "var")
+
+    def __init__(self, name: str, var: ContextVar[Any]) -> None:
+        self.name = name
+        self.var = var
+
+    def __get__(self, instance: object, owner: type | None = None) -> Any:
+
+        value = self.var.get()
+
+        if value is NO_ATTR:
+            raise AttributeError(self.name)
+
+        # Bind the value as a normal class attribute would be bound
+        get = getattr(type(value), "__get__", None)
+        if get is not None:
+            return get(value, instance, owner)
+
+        return value
+
+
+class ContextLocalDispatch:
+    """The bookkeeping of a context-locally patched attribute"""
+
+    def __init__(self, obj: object, attr: str) -> None:
+
+        self.obj = obj
+        self.attr = attr
+        self.refcount = 0
+
+        if isinstance(obj, type):
+            # Retrieve the raw class attribute, without triggering the descriptor
+            # protocol, which is then reapplied by ContextLocalAttribute.
+            self.own = attr in vars(obj)
+            try:
+                original = inspect.getattr_static(obj, attr)
+            except AttributeError:
+                original = NO_ATTR
+
+            self.var: ContextVar[Any] = ContextVar(attr, default=original)
+            self.original = original
+            self.dispatcher: object = ContextLocalAttribute(attr, self.var)
+
+        else:
+            # A descriptor only works on classes, so for modules and other objects,
+            # the attribute is replaced by a function dispatching calls.
+            self.own = attr in getattr(obj, "__dict__", ())
+            original = getattr(obj, attr)
+
+            if not callable(original):
+                raise TypeError(
+                    "context-local patching of non-callable attributes is only "
+                    "supported on classes"
+                )
+
+            self.var = ContextVar(attr, default=original)
+            self.original = original
+            self.dispatcher = self.make_dispatcher(original, self.var)
+
+    @staticmethod
+    def make_dispatcher(
+        original: Callable[..., Any], var: ContextVar[Callable[..., Any]]
+    ) -> Callable[..., Any]:
+        @wraps(original)
+        def dispatcher(*args: Any, **kwargs: Any) -> Any:
+            return var.get()(*args, **kwargs)
+
+        return dispatcher
+
+    def install(self) -> None:
+        setattr_r(self.obj, self.attr, self.dispatcher)
+
+    def uninstall(self) -> None:
+        if self.own:
+            setattr_r(self.obj, self.attr, self.original)
+        else:
+            delattr(self.obj, self.attr)
+
+
+# Map (id(obj), attr) to the dispatch of the context-locally patched attribute
+local_dispatches: dict[tuple[int, str], ContextLocalDispatch] = {}
+local_dispatches_lock = threading.Lock()
+
+
+@contextmanager
+def mp_local_setattr(obj: object, attr: str, value: object) -> Iterator[None]:
+    """
+    Similar to `setattr()`, but the patch is only visible to the current thread or
+    asyncio task (precisely, the current `contextvars` context), and to the tasks it
+    creates, so that code running concurrently can patch the same attribute
+    independently.
+
+    On classes, any attribute can be patched, through a descriptor that resolves the
+    value at each access. On modules and other objects, only callables can be patched,
+    through a dispatcher function that resolves the callable at each call. When no
+    patch is active in any context, the original attribute is restored.
+    """
+
+    key = (id(obj), attr)
+
+    with local_dispatches_lock:
+        dispatch = local_dispatches.get(key)
+        if dispatch is None:
+            dispatch = local_dispatches[key] = ContextLocalDispatch(obj, attr)
+            dispatch.install()
+        dispatch.refcount += 1
+
+    token = dispatch.var.set(value)
+
+    try:
+        yield
+    finally:
+        dispatch.var.reset(token)
+
+        with local_dispatches_lock:
+            dispatch.refcount -= 1
+            if not dispatch.refcount:
+                del local_dispatches[key]
+                dispatch.uninstall()
+
+
+@contextmanager
+def mp_local_mapattrs(
+    func: Callable[[Any], Any], obj: object, attrs: Sequence[str]
+) -> Iterator[None]:
+    """Context-local version of `mapattrs()`. See `local_setattr()`."""
+
+    with ExitStack() as stack:
+        for attr in attrs:
+            new_attr = func(getattr(obj, attr))
+            ctx = mp_local_setattr(obj, attr, new_attr)
+            stack.enter_context(ctx)
+        yield
+
+
+class InstrumentStats(LatencyStats):
+    """`LatencyStats` which also records the self time, excluding instrumented calls"""
+
+    __slots__ = ("self_ns",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.self_ns = 0
+
+    def merge(self, other: LatencyStats) -> None:
+        super().merge(other)
+        self.self_ns += getattr(other, "self_ns", 0)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**super().to_dict(), "self_ns": self.self_ns}
+
+
+def instrumentable(obj: object) -> dict[str, tuple[Callable[..., Any], type | None]]:
+    """
+    Return the functions defined by the class or module, as a mapping from attribute
+    names to the underlying functions and their wrapping `staticmethod`/`classmethod`.
+    """
+
+    if isinstance(obj, type):
+        members = {}
+        for attr, value in vars(obj).items():
+            if isinstance(value, (staticmethod, classmethod)):
+                members[attr] = (value.__func__, type(value))
+            elif isinstance(value, FunctionType):
+                members[attr] = (value, None)
+        return members
+
+    if isinstance(obj, ModuleType):
+        # Skip the functions imported from other modules
+        return {
+            attr: (value, None)
+            for attr, value in vars(obj).items()
+            if isinstance(value, FunctionType) and value.__module__ == obj.__name__
+        }
+
+    raise TypeError(f"expect a class or a module, got {type(obj).__name__!r}")
+
+
+def make_timer(
+    func: Callable[..., Any],
+    name: str,
+    registry: ProfileRegistry,
+    local: threading.local,
+) -> Callable[..., Any]:
+
+    if iscoroutinefunction(func):
+        # The callees of a coroutine function can interleave with other tasks, so its
+        # self time is not separated from its callees.
+
+        @wraps(func)
+        async def async_timer(*args: Any, **kwargs: Any) -> Any:
+            stats = registry.stats(name)
+            stats.calls += 1
+            start = perf_counter_ns()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - start
+                stats.record(elapsed)
+                stats.self_ns += elapsed  # type: ignore
+
+        return async_timer
+
+    @wraps(func)
+    def timer(*args: Any, **kwargs: Any) -> Any:
+        stats = registry.stats(name)
+        stats.calls += 1
+
+        # A stack of the time spent in the instrumented callees of each active call
+        try:
+            children = local.children
+        except AttributeError:
+            children = local.children = []
+
+        children.append(0)
+        start = perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter_ns() - start
+            stats.record(elapsed)
+            stats.self_ns += elapsed - children.pop()  # type: ignore
+            if children:
+                children[-1] += elapsed
+
+    return timer
+
+
+@contextmanager
+def mp_instrument(
+    obj: type | ModuleType, pattern: str = "*"
+) -> Iterator[ProfileRegistry]:
+    """
+    Wrap the functions, static methods and class methods defined by a class or a
+    module, whose names match the glob pattern, with timers recording their call
+    counts, total and self time, and latency histograms. Dunder methods are skipped.
+
+    Yield a `ProfileRegistry` of the statistics, keyed by qualified names. The original
+    attributes are restored on exit.
+
+    Usage:
+
+        ```
+        with mp.instrument(Parser, "parse_*") as report:
+            parse(source)
+        report.snapshot()
+        ```
+    """
+
+    members = instrumentable(obj)
+    registry = ProfileRegistry(InstrumentStats)
+    local = threading.local()
+
+    if isinstance(obj, type):
+        prefix = f"{obj.__module__}.{obj.__qualname__}"
+    else:
+        prefix = obj.__name__
+
+    with ExitStack() as stack:
+        for attr, (func, wrapper_type) in members.items():
+
+            if attr.startswith("__") and attr.endswith("__"):
+                continue
+            if not fnmatchcase(attr, pattern):
+                continue
+
+            timer = make_timer(func, f"{prefix}.{attr}", registry, local)
+            value = timer if wrapper_type is None else wrapper_type(timer)
+
+            # Restore the raw attribute, as `getattr()` would unwrap static methods
+            stack.callback(setattr_r, obj, attr, vars(obj)[attr])
+            setattr_r(obj, attr, value)
+
+        yield registry
+
+
 # Export simple names for use in qualified manner
 #
 # Such as:
@@ -53,3 +350,6 @@ def mp_inject_pre_hook(
 setattr = mp_setattr
 mapattrs = mp_mapattrs
 inject_pre_hook = mp_inject_pre_hook
+local_setattr = mp_local_setattr
+local_mapattrs = mp_local_mapattrs
+instrument = mp_instrument
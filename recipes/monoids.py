@@ -1,13 +1,32 @@
 import operator
-from collections.abc import Callable, Iterable
-from dataclasses import dataclass
+import time
+from array import array
+from collections import deque, namedtuple
+from collections.abc import Callable, Iterable, Iterator, MutableSequence
+from dataclasses import dataclass, field
 from functools import partial, reduce
-from typing import Generic, TypeVar
+from math import inf
+from typing import Any, Generic, NamedTuple, TypeVar
 
-import attrs
 
-
-__all__ = ["Monoid", "BoolAnd", "BoolOr"]
+__all__ = [
+    "Monoid",
+    "Group",
+    "BoolAnd",
+    "BoolOr",
+    "Sum",
+    "Min",
+    "Max",
+    "bounded_min",
+    "bounded_max",
+    "ProductMonoid",
+    "product_monoid",
+    "record_monoid",
+    "SegmentTree",
+    "FenwickTree",
+    "SlidingWindow",
+    "TimeWindow",
+]
 
 
 T = TypeVar("T")
@@ -26,6 +45,514 @@ class Monoid(Generic[T]):
         return reduce(self.mappend, xs, self.mempty)
 
 
+@dataclass
+class Group(Monoid[T]):
+    """A monoid whose elements all have inverses"""
+
+    inverse: Callable[[T], T]
+
+
 # TODO move to libbool
 BoolAnd = Monoid(True, operator.and_)
 BoolOr = Monoid(False, operator.or_)
+
+Sum = Group(0, operator.add, operator.neg)
+# The identities are infinite floats. Use bounded_min() and bounded_max() to store the
+# elements in integer arrays.
+Min = Monoid(inf, min)
+Max = Monoid(-inf, max)
+
+
+def bounded_min(upper: T) -> Monoid[T]:
+    """
+    Create a min monoid over elements not greater than `upper`, which is its identity.
+
+    Unlike `Min`, its identity is finite, so that it can be stored in integer arrays.
+
+    Usage:
+
+        ```
+        tree = SegmentTree(bounded_min(2**63 - 1), xs, typecode="q")
+        ```
+    """
+
+    return Monoid(upper, min)
+
+
+def bounded_max(lower: T) -> Monoid[T]:
+    """
+    Create a max monoid over elements not less than `lower`, which is its identity.
+
+    Unlike `Max`, its identity is finite, so that it can be stored in integer arrays.
+    """
+
+    return Monoid(lower, max)
+
+
+@dataclass
+class ProductMonoid(Monoid[T]):
+    """
+    A monoid over tuples, whose elements are combined component-wise by the component
+    monoids. Use `product_monoid()` or `record_monoid()` to create one.
+    """
+
+    components: tuple[Monoid[Any], ...] = ()
+    _mconcat: Callable[[Iterable[T]], T] = field(
+        default=None, repr=False, compare=False  # type: ignore
+    )
+
+    def mconcat(self, xs: Iterable[T]) -> T:
+        return self._mconcat(xs)
+
+
+# Component monoids with these mappend functions get their mappend inlined as infix
+# operators in the generated code, saving a function call per element.
+INFIX_OPERATORS = [
+    (operator.add, "+"),
+    (operator.mul, "*"),
+    (operator.and_, "&"),
+    (operator.or_, "|"),
+    (operator.xor, "^"),
+]
+
+
+def compile_product(
+    monoids: tuple[Monoid[Any], ...], constructor: Callable[..., T] | None
+) -> tuple[Callable[[T, T], T], Callable[[Iterable[T]], T]]:
+    """Generate the mappend and mconcat functions of a product monoid"""
+
+    # The generated code is unrolled over the components, so that mappend allocates
+    # exactly one tuple, and mconcat allocates no tuple per element but the final one.
+
+    namespace: dict[str, Any] = {"make": constructor}
+    xs = [f"x{i}" for i in range(len(monoids))]
+    ys = [f"y{i}" for i in range(len(monoids))]
+
+    exprs = []
+    for i, monoid in enumerate(monoids):
+        namespace[f"f{i}"] = monoid.mappend
+        namespace[f"e{i}"] = monoid.mempty
+        op = next((op for f, op in INFIX_OPERATORS if f is monoid.mappend), None)
+        exprs.append(f"{{0}}{i} {op} {{1}}{i}" if op else f"f{i}({{0}}{i}, {{1}}{i})")
+
+    def make(args: list[str]) -> str:
+        if constructor is None:
+            return "(" + "".join(arg + ", " for arg in args) + ")"
+        else:
+            return "make(" + ", ".join(args) + ")"
+
+    mappend_body = [
+        f"    {', '.join(xs)}, = x",
+        f"    {', '.join(ys)}, = y",
+        f"    return {make([expr.format('x', 'y') for expr in exprs])}",
+    ]
+
+    mconcat_body = [
+        *(f"    a{i} = e{i}" for i in range(len(monoids))),
+        f"    for {', '.join(xs)}, in xs:",
+        *(f"        a{i} = {expr.format('a', 'x')}" for i, expr in enumerate(exprs)),
+        f"    return {make([f'a{i}' for i in range(len(monoids))])}",
+    ]
+
+    source = "\n".join(
+        ["def mappend(x, y):", *mappend_body, "def mconcat(xs):", *mconcat_body]
+    )
+    exec(compile(source, "<product_monoid>", "exec"), namespace)
+
+    return namespace["mappend"], namespace["mconcat"]
+
+
+def product_monoid(*monoids: Monoid[Any]) -> ProductMonoid[tuple[Any, ...]]:
+    """
+    Create a monoid over tuples, whose elements are combined component-wise by the
+    given monoids. This is useful for computing several aggregates in a single pass.
+
+    Usage:
+
+        ```
+        stats = product_monoid(Sum, Min, Max)
+        count, lo, hi = stats.mconcat((1, x, x) for x in data)
+        ```
+    """
+
+    if not monoids:
+        raise ValueError("product_monoid() requires at least one monoid")
+
+    mappend, mconcat = compile_product(monoids, None)
+    mempty = tuple(monoid.mempty for monoid in monoids)
+    return ProductMonoid(mempty, mappend, monoids, mconcat)
+
+
+def record_monoid(
+    typename: str = "Record", /, **monoids: Monoid[Any]
+) -> ProductMonoid[NamedTuple]:
+    """
+    Similar to `product_monoid()`, but the elements are named tuples, whose fields are
+    the names of the keyword arguments.
+
+    Usage:
+
+        ```
+        stats = record_monoid(count=Sum, low=Min, high=Max)
+        Record = type(stats.mempty)
+        result = stats.mconcat(Record(1, x, x) for x in data)
+        result.high
+        ```
+    """
+
+    if not monoids:
+        raise ValueError("record_monoid() requires at least one monoid")
+
+    record_type = namedtuple(typename, monoids)  # type: ignore
+    components = tuple(monoids.values())
+    mappend, mconcat = compile_product(components, record_type)
+    mempty = record_type(*(monoid.mempty for monoid in components))
+    return ProductMonoid(mempty, mappend, components, mconcat)
+
+
+def normalize_index(index: int, length: int) -> int:
+    """Resolve a possibly negative index, and raise `IndexError` if out of range"""
+
+    if index < 0:
+        index += length
+
+    if not 0 <= index < length:
+        raise IndexError("index out of range")
+
+    return index
+
+
+def make_storage(
+    values: Iterable[T], typecode: str | None = None
+) -> MutableSequence[T]:
+    """
+    Store the values in a list, or in a compact `array.array` if a typecode is given.
+    """
+
+    if typecode is None:
+        return list(values)
+    else:
+        return array(typecode, values)  # type: ignore
+
+
+def make_identity_storage(
+    monoid: Monoid[T], typecode: str | None
+) -> MutableSequence[T]:
+    """Store the identity of the monoid, checking that it fits the typecode"""
+
+    try:
+        return make_storage([monoid.mempty], typecode)
+    except (TypeError, OverflowError) as exc:
+        raise ValueError(
+            f"the identity {monoid.mempty!r} of the monoid can't be stored with "
+            f"typecode {typecode!r}, use bounded_min() or bounded_max() for min/max "
+            "monoids over integers"
+        ) from exc
+
+
+class SegmentTree(Generic[T]):
+    """
+    An array-backed segment tree over the elements of a monoid, supporting point updates
+    and range queries in O(log n) time.
+
+    The monoid doesn't have to be commutative. Pass a `typecode` (as in `array.array`)
+    to store numeric elements compactly. The identity of the monoid is stored too, so
+    with an integer typecode, use `bounded_min()` or `bounded_max()` instead of `Min` or
+    `Max`, whose identities are infinite.
+
+    Usage:
+
+        ```
+        tree = SegmentTree(Sum, [1, 2, 3, 4])
+        tree[1] = 10
+        tree.query(1, 3)  # 13
+        ```
+    """
+
+    def __init__(
+        self, monoid: Monoid[T], xs: Iterable[T] = (), *, typecode: str | None = None
+    ) -> None:
+
+        identity = make_identity_storage(monoid, typecode)
+        leaves = make_storage(xs, typecode)
+        size = len(leaves)
+
+        # The tree is laid out implicitly: the children of node i are nodes 2i and
+        # 2i+1, and the leaves occupy the second half. The node 0 is unused.
+        tree = identity * size
+        tree += leaves
+
+        mappend = monoid.mappend
+        for i in range(size - 1, 0, -1):
+            tree[i] = mappend(tree[2 * i], tree[2 * i + 1])
+
+        self.monoid = monoid
+        self._size = size
+        self._tree = tree
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._tree[self._size :])
+
+    def __getitem__(self, index: int) -> T:
+        return self._tree[normalize_index(index, self._size) + self._size]
+
+    def __setitem__(self, index: int, value: T) -> None:
+
+        tree = self._tree
+        mappend = self.monoid.mappend
+
+        i = normalize_index(index, self._size) + self._size
+        tree[i] = value
+
+        i >>= 1
+        while i:
+            tree[i] = mappend(tree[2 * i], tree[2 * i + 1])
+            i >>= 1
+
+    def query(self, start: int = 0, stop: int | None = None) -> T:
+        """
+        Return the concatenation of the elements in the range `[start, stop)`.
+
+        The range follows the semantics of slicing.
+        """
+
+        start, stop, _ = slice(start, stop).indices(self._size)
+
+        tree = self._tree
+        mappend = self.monoid.mappend
+
+        # Accumulate from both ends separately, to preserve the order of elements for
+        # non-commutative monoids.
+        left = right = self.monoid.mempty
+        lo = start + self._size
+        hi = stop + self._size
+
+        while lo < hi:
+            if lo & 1:
+                left = mappend(left, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right = mappend(tree[hi], right)
+            lo >>= 1
+            hi >>= 1
+
+        return mappend(left, right)
+
+
+class FenwickTree(Generic[T]):
+    """
+    A Fenwick tree (binary indexed tree) over the elements of an abelian group,
+    supporting point updates and range queries in O(log n) time.
+
+    Compared to `SegmentTree`, it takes half the memory, at the cost of requiring the
+    monoid to be commutative and invertible. Pass a `typecode` (as in `array.array`) to
+    store numeric elements compactly.
+    """
+
+    def __init__(
+        self, group: Group[T], xs: Iterable[T] = (), *, typecode: str | None = None
+    ) -> None:
+
+        # The tree is 1-based, and node i covers the range (i - lowbit(i), i].
+        tree = make_identity_storage(group, typecode)
+        tree += make_storage(xs, typecode)
+        size = len(tree) - 1
+
+        mappend = group.mappend
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] = mappend(tree[parent], tree[i])
+
+        self.group = group
+        self._size = size
+        self._tree = tree
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[T]:
+        return (self[i] for i in range(self._size))
+
+    def __getitem__(self, index: int) -> T:
+        index = normalize_index(index, self._size)
+        return self.query(index, index + 1)
+
+    def __setitem__(self, index: int, value: T) -> None:
+        delta = self.group.mappend(value, self.group.inverse(self[index]))
+        self.add(index, delta)
+
+    def add(self, index: int, delta: T) -> None:
+        """Append `delta` to the element at the index"""
+
+        tree = self._tree
+        mappend = self.group.mappend
+
+        i = normalize_index(index, self._size) + 1
+        while i <= self._size:
+            tree[i] = mappend(tree[i], delta)
+            i += i & -i
+
+    def prefix(self, stop: int) -> T:
+        """Return the concatenation of the first `stop` elements"""
+
+        tree = self._tree
+        mappend = self.group.mappend
+
+        acc = self.group.mempty
+        i = min(stop, self._size)
+        while i > 0:
+            acc = mappend(acc, tree[i])
+            i -= i & -i
+
+        return acc
+
+    def query(self, start: int = 0, stop: int | None = None) -> T:
+        """
+        Return the concatenation of the elements in the range `[start, stop)`.
+
+        The range follows the semantics of slicing.
+        """
+
+        start, stop, _ = slice(start, stop).indices(self._size)
+
+        if start >= stop:
+            return self.group.mempty
+
+        return self.group.mappend(
+            self.prefix(stop), self.group.inverse(self.prefix(start))
+        )
+
+
+class SlidingWindow(Generic[T]):
+    """
+    A FIFO window over the elements of a monoid, which maintains the concatenation of
+    the elements inside the window, with amortized O(1) append, eviction and query.
+
+    If `maxlen` is specified, appending to a full window evicts the oldest element,
+    similar to `collections.deque`. The monoid doesn't have to be commutative, nor
+    invertible.
+    """
+
+    # The two-stacks algorithm: new elements are pushed to the back stack, whose
+    # concatenation is maintained incrementally. Old elements are popped from the front
+    # stack, which stores, for each element, the concatenation of that element and all
+    # elements newer than it in the front stack. When the front stack runs out, the back
+    # stack is flipped over into it.
+
+    def __init__(self, monoid: Monoid[T], maxlen: int | None = None) -> None:
+
+        if maxlen is not None and maxlen <= 0:
+            raise ValueError("maxlen should be a positive integer")
+
+        self.monoid = monoid
+        self.maxlen = maxlen
+        self._front: list[T] = []
+        self._back: list[T] = []
+        self._back_sum = monoid.mempty
+
+    def __len__(self) -> int:
+        return len(self._front) + len(self._back)
+
+    def append(self, x: T) -> None:
+        """Append an element to the window, and evict the oldest one if overflowed"""
+
+        if self.maxlen is not None and len(self) >= self.maxlen:
+            self.popleft()
+
+        self._back.append(x)
+        self._back_sum = self.monoid.mappend(self._back_sum, x)
+
+    def popleft(self) -> None:
+        """Evict the oldest element. Raise `IndexError` if the window is empty."""
+
+        if not self._front:
+            self._flip()
+
+        self._front.pop()
+
+    def _flip(self) -> None:
+
+        if not self._back:
+            raise IndexError("pop from an empty window")
+
+        mappend = self.monoid.mappend
+        front = self._front
+
+        acc = self.monoid.mempty
+        for x in reversed(self._back):
+            acc = mappend(x, acc)
+            front.append(acc)
+
+        self._back.clear()
+        self._back_sum = self.monoid.mempty
+
+    def query(self) -> T:
+        """Return the concatenation of the elements inside the window"""
+
+        if not self._front:
+            return self._back_sum
+
+        return self.monoid.mappend(self._front[-1], self._back_sum)
+
+
+class TimeWindow(Generic[T]):
+    """
+    A window over the elements of a monoid, which maintains the concatenation of the
+    elements appended during the last `duration` seconds, with amortized O(1) append,
+    eviction and query.
+
+    Timestamps are read from `clock`, which defaults to `time.monotonic()`, unless
+    explicitly given. They should be non-decreasing.
+    """
+
+    def __init__(
+        self,
+        monoid: Monoid[T],
+        duration: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+
+        if duration <= 0:
+            raise ValueError("duration should be positive")
+
+        self.duration = duration
+        self.clock = clock
+        self._window = SlidingWindow(monoid)
+        self._timestamps: deque[float] = deque()
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    def append(self, x: T, timestamp: float | None = None) -> None:
+        """Append an element to the window, and evict the expired ones"""
+
+        if timestamp is None:
+            timestamp = self.clock()
+
+        self.expire(timestamp)
+        self._window.append(x)
+        self._timestamps.append(timestamp)
+
+    def expire(self, now: float | None = None) -> None:
+        """Evict the elements that are older than `duration` seconds"""
+
+        if now is None:
+            now = self.clock()
+
+        deadline = now - self.duration
+        timestamps = self._timestamps
+
+        while timestamps and timestamps[0] <= deadline:
+            timestamps.popleft()
+            self._window.popleft()
+
+    def query(self, now: float | None = None) -> T:
+        """Return the concatenation of the elements inside the window"""
+
+        self.expire(now)
+        return self._window.query()
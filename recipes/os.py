@@ -1,11 +1,16 @@
+from __future__ import annotations
+
 from collections.abc import Iterator
 from pathlib import Path
-
-from pathspec import PathSpec
+from typing import TYPE_CHECKING
 
 from .builtins import read_text
 
 
+if TYPE_CHECKING:
+    from pathspec import PathSpec
+
+
 __all__ = ["gitignore_aware_os_walk"]
 
 
@@ -17,6 +22,8 @@ def gitignore_aware_os_walk(path: Path, *, aggressive: bool = False) -> Iterator
     and the `.gitignore` file.
     """
 
+    from pathspec import PathSpec
+
     if aggressive:
         pathspec = PathSpec.from_lines("gitwildmatch", [".git/", ".gitignore"])
     else:
@@ -36,6 +43,8 @@ def _gitignore_aware_os_walk(
 
     if local_gitignore.is_file():
 
+        from pathspec import PathSpec
+
         lines = read_text(local_gitignore).splitlines()
 
         local_pathspec = PathSpec.from_lines("gitwildmatch", lines)
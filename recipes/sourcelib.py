@@ -1,7 +1,22 @@
+from __future__ import annotations  # for types imported from _typeshed
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, NamedTuple
+
 from .exceptions import OutdentedCommentError, Unreachable
 
 
-__all__ = ["unindent_source"]
+if TYPE_CHECKING:
+    from _typeshed import StrPath
+
+
+__all__ = ["unindent_source", "TransformReport", "transform_files"]
 
 
 def is_blank_line(line: str) -> bool:
@@ -66,3 +81,155 @@ def unindent_source(text: str, *, reflow_comments: bool = False) -> str:
             raise Unreachable
 
     return "".join(new_lines)
+
+
+def atomic_write_text(file: StrPath, text: str, encoding: str = "utf-8") -> None:
+    """
+    Write text to a temporary file in the same directory, and then atomically replace
+    the file with it, so that readers never see a partially written file.
+    """
+
+    dirname = os.path.dirname(os.path.abspath(file))
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix=".", suffix=".tmp")
+
+    try:
+        with open(fd, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+        if os.path.exists(file):
+            shutil.copymode(file, tmp)
+        os.replace(tmp, file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def content_hash(text: str, version: str) -> str:
+    return hashlib.sha256(f"{version}\0{text}".encode()).hexdigest()
+
+
+def transform_file(
+    file: str,
+    transform: Callable[[str], str],
+    version: str,
+    stored_hash: str | None,
+    encoding: str,
+) -> tuple[str, str, str | None]:
+    """
+    Transform a file in place. Return the status of the file, which is one of
+    `"skipped"`, `"unchanged"`, `"changed"` and `"failed"`, along with the content hash
+    of the file after transformation, or the error message if failed.
+    """
+
+    try:
+        # Disable newline translation, to preserve the line endings
+        with open(file, "r", encoding=encoding, newline="") as f:
+            source = f.read()
+
+        if content_hash(source, version) == stored_hash:
+            return "skipped", stored_hash, None
+
+        new_source = transform(source)
+
+        if new_source == source:
+            return "unchanged", content_hash(source, version), None
+
+        atomic_write_text(file, new_source, encoding)
+        return "changed", content_hash(new_source, version), None
+
+    # The exception may be unpicklable, so only its message is sent back
+    except Exception as exc:
+        return "failed", "", f"{type(exc).__name__}: {exc}"
+
+
+class TransformReport(NamedTuple):
+    """The files processed by `transform_files()`, grouped by their outcomes"""
+
+    changed: list[str]
+    unchanged: list[str]
+    skipped: list[str]
+    failed: dict[str, str]
+
+
+def transform_files(
+    files: Iterable[StrPath],
+    transform: Callable[[str], str],
+    *,
+    version: str = "",
+    cache_file: StrPath | None = None,
+    max_workers: int | None = None,
+    chunksize: int = 16,
+    encoding: str = "utf-8",
+) -> TransformReport:
+    """
+    Transform the source files in place with a process pool of `max_workers`
+    processes, and return a report of the outcomes.
+
+    The `transform` function, such as a partial of `recipes.cst.transform_source()`,
+    must be picklable. Only the files whose contents are changed are written back,
+    atomically, and with their line endings preserved. Failures are collected with
+    their error messages, without aborting the other files.
+
+    If `cache_file` is specified, the content hash of each file after transformation,
+    salted with `version`, is stored in it, as JSON. Files whose hashes match are
+    skipped in later runs. Bump `version` whenever the transformation changes. If
+    `max_workers` is 1, the files are processed in the current process.
+
+    Usage:
+
+        ```
+        report = transform_files(
+            (path for path in gitignore_aware_os_walk(root) if path.suffix == ".py"),
+            partial(transform_source, RenameTransformer("old", "new")),
+            version="1",
+            cache_file=".codemod-cache.json",
+        )
+        ```
+    """
+
+    hashes: dict[str, str] = {}
+    if cache_file is not None and os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            hashes = json.load(f)
+
+    files = [os.path.abspath(file) for file in files]
+    stored_hashes = [hashes.get(file) for file in files]
+    args = (
+        files,
+        [transform] * len(files),
+        [version] * len(files),
+        stored_hashes,
+        [encoding] * len(files),
+    )
+
+    if max_workers == 1:
+        results = map(transform_file, *args)
+        report = collect_transform_results(files, results, hashes)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            results = executor.map(transform_file, *args, chunksize=chunksize)
+            report = collect_transform_results(files, results, hashes)
+
+    if cache_file is not None:
+        atomic_write_text(cache_file, json.dumps(hashes, indent=0, sort_keys=True))
+
+    return report
+
+
+def collect_transform_results(
+    files: list[str],
+    results: Iterable[tuple[str, str, str | None]],
+    hashes: dict[str, str],
+) -> TransformReport:
+
+    report = TransformReport([], [], [], {})
+
+    for file, (status, new_hash, error) in zip(files, results):
+        if status == "failed":
+            assert error is not None
+            report.failed[file] = error
+            hashes.pop(file, None)
+        else:
+            getattr(report, status).append(file)
+            hashes[file] = new_hash
+
+    return report
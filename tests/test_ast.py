@@ -1,6 +1,8 @@
 import ast
 
-from recipes.ast import transform_source
+import pytest
+
+from recipes.ast import transform_source, transform_source_pipeline
 
 
 def test_transform_source() -> None:
@@ -13,3 +15,81 @@ def test_transform_source() -> None:
             return node
 
     assert transform_source(IncrementIntegerLiteral(), source) == "a = 2\nb = 3"
+
+
+class IncrementIntegerLiteral(ast.NodeTransformer):
+    def visit_Constant(self, node: ast.Constant) -> ast.Constant:
+        if isinstance(node.value, int):
+            node.value += 1
+        return node
+
+
+class RenameName(ast.NodeTransformer):
+    def __init__(self, old: str, new: str) -> None:
+        self.old = old
+        self.new = new
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        if node.id == self.old:
+            node.id = self.new
+        return node
+
+
+class RemovePass(ast.NodeTransformer):
+    def visit_Pass(self, node: ast.Pass) -> None:
+        return None
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        self.generic_visit(node)
+        if not node.body:
+            node.body.append(ast.Expr(ast.Constant(...)))
+        return node
+
+
+class ReturnNone(ast.NodeTransformer):
+    """Replace return values with None, visiting function bodies manually"""
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        node.body = [self.visit(statement) for statement in node.body]
+        return node
+
+    def visit_Return(self, node: ast.Return) -> ast.Return:
+        return ast.Return(ast.Constant(None))
+
+
+class UpperCaseNames(ast.NodeTransformer):
+    """Upper-case names, skipping function bodies"""
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        node.id = node.id.upper()
+        return node
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        return node
+
+
+def test_transform_source_pipeline() -> None:
+    source = "def f():\n    pass\na = 1\nb = a"
+    transformers = [
+        IncrementIntegerLiteral(),
+        RenameName("a", "c"),
+        RenameName("b", "d"),
+        RemovePass(),
+    ]
+
+    expected = "def f():\n    ...\nc = 2\nd = c"
+    assert transform_source_pipeline(transformers, source) == expected
+
+
+def test_transform_source_pipeline_traversal_control() -> None:
+    source = "x = 1\ndef f():\n    return x"
+
+    # Subtrees skipped by one transformer are still visited by the others
+    transformers = [UpperCaseNames(), RenameName("x", "y"), IncrementIntegerLiteral()]
+    expected = "X = 2\n\ndef f():\n    return y"
+    assert transform_source_pipeline(transformers, source) == expected
+
+    # Children visited manually with self.visit() are kept in place
+    transformers = [ReturnNone(), UpperCaseNames()]
+    expected = "X = 1\n\ndef f():\n    return None"
+    assert transform_source_pipeline(transformers, source) == expected
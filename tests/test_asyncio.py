@@ -0,0 +1,639 @@
+import asyncio
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from subprocess import CalledProcessError, TimeoutExpired
+
+import pytest
+
+from recipes.asyncio import (
+    BatchLoader,
+    CompositeLimit,
+    LoopMonitor,
+    RateLimiter,
+    SlidingWindowLimit,
+    SubprocessPool,
+    ThreadBatchLoader,
+    TokenBucket,
+    amap,
+    aread_chunks,
+    aread_text,
+    aread_texts,
+    as_completed_map,
+    asingleflight,
+    asyncio_run,
+    asyncio_subprocess_stream,
+    awrite_text,
+    awrite_texts,
+)
+
+
+class TestAsingleflight:
+    """Unit tests for `asingleflight()`"""
+
+    def test_coalescing(self) -> None:
+        calls = []
+
+        @asingleflight
+        async def work(x: int) -> object:
+            calls.append(x)
+            await asyncio.sleep(0.01)
+            return object()
+
+        async def main() -> None:
+            results = await asyncio.gather(*(work(1) for _ in range(5)), work(2))
+            assert calls == [1, 2]
+            assert all(result is results[0] for result in results[:5])
+            assert await work(1) is not results[0]
+
+        asyncio.run(main())
+
+    def test_cancellation_doesnt_propagate(self) -> None:
+        @asingleflight
+        async def work() -> int:
+            await asyncio.sleep(0.01)
+            return 42
+
+        async def main() -> None:
+            first = asyncio.ensure_future(work())
+            second = asyncio.ensure_future(work())
+            await asyncio.sleep(0)
+            first.cancel()
+            assert await second == 42
+
+        asyncio.run(main())
+
+    def test_exception(self) -> None:
+        @asingleflight(retain=60)
+        async def fail() -> None:
+            raise ValueError
+
+        async def main() -> None:
+            results = await asyncio.gather(fail(), fail(), return_exceptions=True)
+            assert all(isinstance(result, ValueError) for result in results)
+
+            # Exceptions are not retained
+            with pytest.raises(ValueError):
+                await fail()
+
+        asyncio.run(main())
+
+    def test_retain_across_loops(self) -> None:
+        @asingleflight(retain=0.01)
+        async def f() -> object:
+            return object()
+
+        first = asyncio.run(f())
+        time.sleep(0.2)
+        assert asyncio.run(f()) is not first
+
+        # Tasks of another loop are not awaited even within the retention window
+        g = asingleflight(retain=60)(f.__wrapped__)
+        assert asyncio.run(g()) is not asyncio.run(g())
+
+
+class TestBatchLoader:
+    """Unit tests for `BatchLoader`"""
+
+    def test_batching(self) -> None:
+        batches = []
+
+        async def double(keys: list[int]) -> list[int | BaseException]:
+            batches.append(keys)
+            return [ValueError() if key < 0 else key * 2 for key in keys]
+
+        async def main() -> None:
+            loader = BatchLoader(double, max_batch_size=3)
+            results = await asyncio.gather(
+                *map(loader.load, [1, 2, 1, 3, 4, -1]), return_exceptions=True
+            )
+
+            assert results[:5] == [2, 4, 2, 6, 8]
+            assert isinstance(results[5], ValueError)
+            assert batches == [[1, 2, 3], [4, -1]]
+
+        asyncio.run(main())
+
+    def test_cache(self) -> None:
+        batches = []
+
+        async def identity(keys: list[int]) -> list[int]:
+            batches.append(keys)
+            return keys
+
+        async def main() -> None:
+            loader = BatchLoader(identity, cache=True)
+            assert await loader.load_many([1, 2]) == [1, 2]
+            assert await loader.load_many([2, 3]) == [2, 3]
+            assert batches == [[1, 2], [3]]
+
+            loader.clear()
+            assert await loader.load(1) == 1
+            assert batches == [[1, 2], [3], [1]]
+
+        asyncio.run(main())
+
+    def test_bulk_function_failure(self) -> None:
+        async def fail(keys: list[int]) -> list[int]:
+            raise RuntimeError
+
+        async def main() -> None:
+            loader = BatchLoader(fail)
+            with pytest.raises(RuntimeError):
+                await loader.load(1)
+
+        asyncio.run(main())
+
+    def test_bulk_function_returning_iterable(self) -> None:
+        async def double(keys: list[int]) -> Iterator[int]:
+            return (key * 2 for key in keys)
+
+        async def fail(keys: list[int]) -> int:
+            return 0
+
+        async def main() -> None:
+            loader = BatchLoader(double)
+            assert await asyncio.wait_for(loader.load_many([1, 2]), 1) == [2, 4]
+
+            # Not iterable
+            loader = BatchLoader(fail)  # type: ignore
+            with pytest.raises(TypeError):
+                await asyncio.wait_for(loader.load_many([1, 2]), 1)
+
+        asyncio.run(main())
+
+
+def test_thread_batch_loader() -> None:
+    batches = []
+
+    def double(keys: list[int]) -> list[int]:
+        batches.append(keys)
+        return [key * 2 for key in keys]
+
+    loader = ThreadBatchLoader(double, max_delay=0.1)
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(loader.load, [1, 2, 2, 3]))
+
+    assert results == [2, 4, 4, 6]
+    assert len(batches) == 1
+    assert sorted(batches[0]) == [1, 2, 3]
+
+    assert loader.load_many([4, 5]) == [8, 10]
+    assert batches[1] == [4, 5]
+
+
+def test_thread_batch_loader_failure() -> None:
+    def double(keys: list[int]) -> Iterator[int]:
+        return (key * 2 for key in keys)
+
+    def fail(keys: list[int]) -> list[int]:
+        raise RuntimeError
+
+    with ThreadPoolExecutor(4) as executor:
+        loader = ThreadBatchLoader(double, max_delay=0.1)
+        futures = [executor.submit(loader.load, key) for key in [1, 2, 3]]
+        assert [future.result(timeout=1) for future in futures] == [2, 4, 6]
+
+        loader = ThreadBatchLoader(fail, max_delay=0.1)
+        futures = [executor.submit(loader.load, key) for key in [1, 2, 3]]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=1)
+
+
+class TestAsyncioRun:
+    """Unit tests for `asyncio_run()`"""
+
+    @pytest.mark.parametrize("mode", ["run", "runner", "thread"])
+    def test_modes(self, mode: str) -> None:
+        @asyncio_run(mode=mode)  # type: ignore
+        async def add(x: int, y: int) -> int:
+            await asyncio.sleep(0)
+            return x + y
+
+        assert add(1, 2) == 3
+        with ThreadPoolExecutor(4) as executor:
+            results = executor.map(add, range(20), range(20))
+            assert list(results) == list(range(0, 40, 2))
+
+    def test_bare_decorator(self) -> None:
+        @asyncio_run
+        async def identity(x: int) -> int:
+            return x
+
+        assert identity(1) == 1
+
+    def test_loop_reuse(self) -> None:
+        @asyncio_run(mode="runner")
+        async def runner_loop() -> asyncio.AbstractEventLoop:
+            return asyncio.get_running_loop()
+
+        @asyncio_run(mode="thread")
+        async def thread_loop() -> asyncio.AbstractEventLoop:
+            return asyncio.get_running_loop()
+
+        assert runner_loop() is runner_loop()
+        assert thread_loop() is thread_loop() is not runner_loop()
+
+        with ThreadPoolExecutor(1) as executor:
+            assert executor.submit(runner_loop).result() is not runner_loop()
+            assert executor.submit(thread_loop).result() is thread_loop()
+
+    def test_runners_closed_with_threads(self) -> None:
+        @asyncio_run(mode="runner")
+        async def runner_loop() -> asyncio.AbstractEventLoop:
+            return asyncio.get_running_loop()
+
+        with ThreadPoolExecutor(2) as executor:
+            loops = {executor.submit(runner_loop).result() for _ in range(4)}
+
+        assert loops and all(loop.is_closed() for loop in loops)
+        assert not runner_loop().is_closed()
+
+    def test_exception(self) -> None:
+        @asyncio_run(mode="thread")
+        async def fail() -> None:
+            raise KeyError("key")
+
+        with pytest.raises(KeyError):
+            fail()
+
+    def test_invalid_mode(self) -> None:
+        with pytest.raises(ValueError):
+
+            @asyncio_run(mode="invalid")  # type: ignore
+            async def noop() -> None:
+                pass
+
+
+def python_command(code: str) -> list[str]:
+    return [sys.executable, "-c", code]
+
+
+class TestSubprocessPool:
+    """Unit tests for `SubprocessPool`"""
+
+    def test_map(self) -> None:
+        commands = [python_command(f"print({i})") for i in range(5)]
+        outputs = asyncio.run(SubprocessPool(2).map(commands))
+        assert [int(output) for output in outputs] == list(range(5))
+
+    def test_as_completed(self) -> None:
+        commands = [
+            python_command("import time; time.sleep(0.5)"),
+            python_command("pass"),
+        ]
+
+        async def main() -> list[int]:
+            pool = SubprocessPool(2)
+            return [index async for index, _ in pool.as_completed(commands)]
+
+        assert asyncio.run(main()) == [1, 0]
+
+    def test_concurrency_limit(self) -> None:
+        commands = [python_command("import time; time.sleep(0.3)")] * 4
+
+        start = time.perf_counter()
+        asyncio.run(SubprocessPool(2).map(commands))
+        assert time.perf_counter() - start >= 0.6
+
+    def test_reuse_across_loops(self) -> None:
+        commands = [python_command(f"print({i})") for i in range(3)]
+        pool = SubprocessPool(1)
+
+        for _ in range(2):
+            outputs = asyncio.run(pool.map(commands))
+            assert [int(output) for output in outputs] == list(range(3))
+
+    def test_errors_are_aggregated(self) -> None:
+        commands = [
+            python_command("import sys; sys.exit(1)"),
+            python_command("print('ok')"),
+            python_command("import time; time.sleep(10)"),
+        ]
+        outputs = []
+
+        async def main() -> None:
+            pool = SubprocessPool(3, timeout=0.5)
+            async for _, output in pool.as_completed(commands):
+                outputs.append(output)
+
+        start = time.perf_counter()
+        with pytest.raises(ExceptionGroup) as exc_info:
+            asyncio.run(main())
+
+        assert time.perf_counter() - start < 5
+        assert outputs == [b"ok\n"]
+        assert exc_info.group_contains(CalledProcessError)  # type: ignore
+        assert exc_info.group_contains(TimeoutExpired)  # type: ignore
+
+
+class TestAsyncioSubprocessStream:
+    """Unit tests for `asyncio_subprocess_stream()`"""
+
+    def test_lines_and_tee(self, tmp_path: Path) -> None:
+        command = python_command("for i in range(3): print(i)")
+        tee = tmp_path / "output.txt"
+
+        async def main() -> list[bytes]:
+            stream = asyncio_subprocess_stream(command, lines=True, tee=tee)
+            return [line async for line in stream]
+
+        assert asyncio.run(main()) == [b"0\n", b"1\n", b"2\n"]
+        assert tee.read_bytes() == b"0\n1\n2\n"
+
+    def test_unopenable_tee(self, tmp_path: Path) -> None:
+        marker = tmp_path / "marker"
+        code = f"import time; time.sleep(0.2); open({str(marker)!r}, 'w')"
+        tee = tmp_path / "missing" / "output.txt"
+
+        async def main() -> list[bytes]:
+            stream = asyncio_subprocess_stream(python_command(code), tee=tee)
+            return [chunk async for chunk in stream]
+
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(main())
+
+        # No process is left running
+        time.sleep(0.6)
+        assert not marker.exists()
+
+    def test_chunks_are_bounded(self) -> None:
+        command = python_command("import sys; sys.stdout.write('x' * 100_000)")
+
+        async def main() -> list[bytes]:
+            stream = asyncio_subprocess_stream(command, chunk_size=1000)
+            return [chunk async for chunk in stream]
+
+        chunks = asyncio.run(main())
+        assert all(len(chunk) <= 1000 for chunk in chunks)
+        assert b"".join(chunks) == b"x" * 100_000
+
+    def test_called_process_error(self) -> None:
+        command = python_command("print('partial'); raise SystemExit(3)")
+        lines = []
+
+        async def main() -> None:
+            async for line in asyncio_subprocess_stream(command, lines=True):
+                lines.append(line)
+
+        with pytest.raises(CalledProcessError) as exc_info:
+            asyncio.run(main())
+
+        assert exc_info.value.returncode == 3
+        assert lines == [b"partial\n"]
+
+    def test_early_close_kills_process(self) -> None:
+        command = python_command("while True: print('y' * 1000)")
+
+        async def main() -> None:
+            stream = asyncio_subprocess_stream(command, lines=True, limit=10_000)
+            async for _ in stream:
+                break
+            await stream.aclose()  # type: ignore
+
+        start = time.perf_counter()
+        asyncio.run(main())
+        assert time.perf_counter() - start < 5
+
+
+def test_file_io(tmp_path: Path) -> None:
+    texts = {tmp_path / f"{i}.txt": f"text {i} \u00e9" for i in range(150)}
+
+    async def main() -> None:
+        await awrite_texts(texts, batch_size=16)
+        assert await aread_texts(texts, batch_size=16) == list(texts.values())
+
+        file = tmp_path / "single.txt"
+        await awrite_text(file, "single")
+        assert await aread_text(file) == "single"
+
+        with pytest.raises(FileNotFoundError):
+            await aread_texts([file, tmp_path / "missing.txt"])
+
+    asyncio.run(main())
+
+
+def test_aread_chunks(tmp_path: Path) -> None:
+    file = tmp_path / "large.bin"
+    file.write_bytes(bytes(range(256)) * 100)
+
+    async def main() -> list[bytes]:
+        return [chunk async for chunk in aread_chunks(file, chunk_size=1000)]
+
+    chunks = asyncio.run(main())
+    assert [len(chunk) for chunk in chunks] == [1000] * 25 + [600]
+    assert b"".join(chunks) == file.read_bytes()
+
+
+class TestLoopMonitor:
+    """Unit tests for `LoopMonitor`"""
+
+    def test_lag_and_tasks(self) -> None:
+        async def main() -> LoopMonitor:
+            async with LoopMonitor(interval=0.01) as monitor:
+                tasks = [asyncio.create_task(asyncio.sleep(0.1)) for _ in range(5)]
+                await asyncio.gather(*tasks)
+            return monitor
+
+        monitor = asyncio.run(main())
+        kinds = {event.kind for event in monitor.events}
+        assert kinds == {"lag", "tasks"}
+        counts = [event.value for event in monitor.events if event.kind == "tasks"]
+        assert max(counts) >= 6
+
+    def test_slow_callback(self) -> None:
+        def block_the_loop() -> None:
+            time.sleep(0.5)
+
+        async def main() -> LoopMonitor:
+            async with LoopMonitor(interval=0.01, threshold=0.1) as monitor:
+                await asyncio.sleep(0.05)
+                block_the_loop()
+                await asyncio.sleep(0.05)
+            return monitor
+
+        monitor = asyncio.run(main())
+
+        slow = [event for event in monitor.events if event.kind == "slow_callback"]
+        assert len(slow) == 1
+        assert slow[0].detail is not None and "block_the_loop" in slow[0].detail
+        assert max(event.value for event in monitor.events if event.kind == "lag") > 0.3
+
+    def test_track_coroutines(self) -> None:
+        async def busy() -> None:
+            for _ in range(3):
+                time.sleep(0.02)
+                await asyncio.sleep(0)
+
+        async def main() -> LoopMonitor:
+            monitor = LoopMonitor(track_coroutines=True, sink=lambda _: None)
+            async with monitor:
+                await asyncio.gather(busy(), busy())
+            return monitor
+
+        monitor = asyncio.run(main())
+        name = next(name for name in monitor.coroutine_times if name.endswith("busy"))
+        assert monitor.coroutine_times[name] >= 0.1
+
+
+class TestAmap:
+    """Unit tests for `amap()` and `as_completed_map()`"""
+
+    @staticmethod
+    async def collect(aiterator) -> list:
+        return [x async for x in aiterator]
+
+    def test_ordered(self) -> None:
+        async def delayed(x: int) -> int:
+            await asyncio.sleep((5 - x) * 0.01)
+            return x * x
+
+        results = asyncio.run(self.collect(amap(delayed, range(6), concurrency=3)))
+        assert results == [x * x for x in range(6)]
+
+    def test_unordered(self) -> None:
+        async def delayed(x: int) -> int:
+            await asyncio.sleep(x * 0.05)
+            return x
+
+        aiterator = as_completed_map(delayed, [3, 1, 2], concurrency=3)
+        assert asyncio.run(self.collect(aiterator)) == [1, 2, 3]
+
+    def test_async_iterable_and_bounds(self) -> None:
+        in_flight = max_in_flight = npulled = 0
+
+        async def source():
+            nonlocal npulled
+            for i in range(20):
+                npulled += 1
+                yield i
+
+        async def work(x: int) -> int:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+            return x
+
+        async def main() -> None:
+            results = []
+            async for x in amap(work, source(), concurrency=3, window=4):
+                results.append(x)
+                await asyncio.sleep(0.01)
+                # Items pulled but not yet yielded are bounded by the window
+                assert npulled - len(results) <= 4
+            assert results == list(range(20))
+
+        asyncio.run(main())
+        assert max_in_flight == 3
+
+    def test_timeout_and_retries(self) -> None:
+        attempts: dict[int, int] = {}
+
+        async def flaky(x: int) -> int:
+            attempts[x] = attempts.get(x, 0) + 1
+            if attempts[x] == 1:
+                await asyncio.sleep(1)
+            return x
+
+        aiterator = amap(flaky, range(3), timeout=0.05, retries=1)
+        assert asyncio.run(self.collect(aiterator)) == [0, 1, 2]
+        assert attempts == {0: 2, 1: 2, 2: 2}
+
+    def test_exception_cancels_pending_calls(self) -> None:
+        cancelled = []
+
+        async def work(x: int) -> int:
+            if x == 1:
+                raise KeyError(x)
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(x)
+                raise
+            return x
+
+        aiterator = as_completed_map(work, range(10), concurrency=4)
+        with pytest.raises(KeyError):
+            asyncio.run(self.collect(aiterator))
+        assert sorted(cancelled) == [0, 2, 3, 4]
+
+    def test_source_exception(self) -> None:
+        def source():
+            yield 1
+            raise ValueError
+
+        async def identity(x: int) -> int:
+            return x
+
+        results = []
+
+        async def main() -> None:
+            async for x in amap(identity, source()):
+                results.append(x)
+
+        with pytest.raises(ValueError):
+            asyncio.run(main())
+        assert results == [1]
+
+
+class TestRateLimiter:
+    """Unit tests for `RateLimiter` and the rate limits"""
+
+    @staticmethod
+    def delays(limit, times: list[float]) -> list[float]:
+        """Reserve permits at the given times of a fake clock, and return the delays"""
+
+        clock = iter(times)
+        limiter = RateLimiter(limit, clock=lambda: next(clock))
+        return [round(limiter.reserve(), 6) for _ in times]
+
+    def test_token_bucket(self) -> None:
+        limit = TokenBucket(rate=10, burst=3)
+        assert self.delays(limit, [0, 0, 0, 0, 0, 1, 1]) == [0, 0, 0, 0.1, 0.2, 0, 0]
+
+    def test_sliding_window(self) -> None:
+        limit = SlidingWindowLimit(2, period=1)
+        assert self.delays(limit, [0, 0.5, 0.6, 0.7, 2]) == [0, 0, 0.4, 0.8, 0]
+
+    def test_composite(self) -> None:
+        limit = CompositeLimit(TokenBucket(rate=10), SlidingWindowLimit(2, period=1))
+        assert self.delays(limit, [0, 0, 0]) == [0, 0.1, 1]
+
+    def test_async_fifo(self) -> None:
+        limiter = RateLimiter(TokenBucket(rate=50))
+        order = []
+
+        @limiter
+        async def call(i: int) -> None:
+            order.append(i)
+
+        async def main() -> None:
+            await asyncio.gather(*(call(i) for i in range(10)))
+
+        start = time.perf_counter()
+        asyncio.run(main())
+        assert 0.17 <= time.perf_counter() - start < 1
+        assert order == list(range(10))
+
+    def test_threads(self) -> None:
+        limiter = RateLimiter(SlidingWindowLimit(5, period=0.1))
+        grants = []
+
+        def call() -> None:
+            with limiter:
+                grants.append(time.perf_counter())
+
+        with ThreadPoolExecutor(8) as executor:
+            for _ in range(15):
+                executor.submit(call)
+
+        grants.sort()
+        assert grants[-1] - grants[0] >= 0.19
+        # No window of the period contains more than the limit
+        assert all(grants[i + 5] - grants[i] >= 0.099 for i in range(10))
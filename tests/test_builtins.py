@@ -1,6 +1,8 @@
+import threading
+
 import pytest
 
-from recipes.builtins import hashable
+from recipes.builtins import call_at_thread_exit, hashable
 
 
 def test_hashable() -> None:
@@ -36,3 +38,18 @@ def test_hashable() -> None:
     assert hashable(pytest)
 
     assert hashable(test_hashable)
+
+
+def test_call_at_thread_exit() -> None:
+    calls = []
+
+    def run() -> None:
+        call_at_thread_exit(calls.append, 1)
+        call_at_thread_exit(calls.append, 2)
+        assert not calls
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+
+    assert sorted(calls) == [1, 2]
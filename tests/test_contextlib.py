@@ -1,9 +1,27 @@
+import asyncio
+import json
 import re
 import sys
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import pytest
 
-from recipes.contextlib import literal_block, skip_context
+from recipes.contextlib import (
+    InMemorySpanExporter,
+    JSONLinesSpanExporter,
+    LatencyHistogram,
+    Pool,
+    ProfileRegistry,
+    literal_block,
+    profiled,
+    set_span_exporter,
+    skip_context,
+    span,
+)
 from recipes.exceptions import OutdentedCommentError
 
 
@@ -117,3 +135,333 @@ class TestLiteralBlock:
               # foo bar
                 b = 2
     # fmt: on
+
+
+class TestProfiled:
+    """Unit tests for `profiled` and `ProfileRegistry`"""
+
+    def test_decorator(self) -> None:
+        registry = ProfileRegistry()
+
+        @profiled(registry=registry)
+        def work() -> int:
+            return 42
+
+        @profiled("async_work", registry=registry)
+        async def async_work() -> int:
+            await asyncio.sleep(0.01)
+            return 42
+
+        assert work() == 42
+        assert asyncio.run(async_work()) == 42
+
+        snapshot = registry.snapshot()
+        assert snapshot[work.__module__ + "." + work.__qualname__]["calls"] == 1
+        assert snapshot["async_work"]["p50_ns"] >= 10_000_000 * 0.8
+
+    def test_sampling_across_threads(self) -> None:
+        registry = ProfileRegistry()
+
+        @profiled("work", sample=4, registry=registry)
+        def work() -> None:
+            pass
+
+        def run() -> None:
+            for _ in range(100):
+                work()
+
+        threads = [threading.Thread(target=run) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = json.loads(registry.to_json())["work"]
+        assert stats["calls"] == 300
+        assert stats["sampled"] == 75
+
+        registry.reset()
+        assert registry.snapshot() == {}
+
+    def test_exited_threads_are_folded(self) -> None:
+        registry = ProfileRegistry()
+
+        @profiled("work", registry=registry)
+        def work() -> None:
+            pass
+
+        for _ in range(10):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        # Only the statistics of live threads are kept apart
+        assert not registry._thread_stats
+        work()
+        assert len(registry._thread_stats) == 1
+        assert registry.snapshot()["work"]["calls"] == 11
+
+    def test_context_manager(self) -> None:
+        registry = ProfileRegistry()
+
+        with profiled("block", registry=registry):
+            time.sleep(0.01)
+
+        stats = registry.snapshot()["block"]
+        assert stats["calls"] == stats["sampled"] == 1
+        assert stats["max_ns"] >= 10_000_000
+
+        with pytest.raises(TypeError):
+            with profiled(registry=registry):
+                pass
+
+
+def test_latency_histogram() -> None:
+    histogram = LatencyHistogram()
+    for ns in range(1, 1001):
+        histogram.record(ns * 1000)
+
+    assert histogram.total == 1000
+    assert histogram.quantile(0.5) == pytest.approx(500_000, rel=0.125)
+    assert histogram.quantile(0.99) == pytest.approx(990_000, rel=0.125)
+
+
+class TestSpan:
+    """Unit tests for `span`"""
+
+    @pytest.fixture
+    def exporter(self) -> Iterator[InMemorySpanExporter]:
+        exporter = InMemorySpanExporter()
+        previous = set_span_exporter(exporter)
+        yield exporter
+        set_span_exporter(previous)
+
+    def test_nesting(self, exporter: InMemorySpanExporter) -> None:
+        with span("request"):
+            with span("parse"):
+                pass
+            with span("handle"):
+                with span("query"):
+                    time.sleep(0.01)
+
+        [trace] = exporter.traces
+        assert [(s.name, s.parent_id) for s in trace] == [
+            ("request", None),
+            ("parse", 0),
+            ("handle", 0),
+            ("query", 2),
+        ]
+        assert all(s.duration_ns >= 0 for s in trace)
+        assert trace[0].duration_ns >= trace[3].duration_ns >= 10_000_000
+
+    def test_many_spans(self, exporter: InMemorySpanExporter) -> None:
+        for _ in range(2):
+            with span("root"):
+                for i in range(100):
+                    with span(str(i)):
+                        pass
+
+        for trace in exporter.traces:
+            assert [s.name for s in trace[1:]] == [str(i) for i in range(100)]
+
+    def test_async(self, exporter: InMemorySpanExporter) -> None:
+        async def stage(name: str) -> None:
+            async with span(name):
+                await asyncio.sleep(0.01)
+
+        async def handle(request: str) -> None:
+            async with span(request):
+                await asyncio.gather(stage("a"), stage("b"))
+
+        async def main() -> None:
+            await asyncio.gather(handle("x"), handle("y"))
+
+        asyncio.run(main())
+
+        assert len(exporter.traces) == 2
+        for trace in exporter.traces:
+            assert len({s.trace_id for s in trace}) == 1
+            assert sorted((s.name, s.parent_id) for s in trace[1:]) == [
+                ("a", 0),
+                ("b", 0),
+            ]
+
+    def test_detached_task(self, exporter: InMemorySpanExporter) -> None:
+        async def late_child(started: asyncio.Event) -> None:
+            await started.wait()
+            with span("late-child"):
+                pass
+
+        async def main() -> None:
+            started = asyncio.Event()
+            async with span("req1"):
+                task = asyncio.create_task(late_child(started))
+            # The buffer of req1 is reused by req2
+            async with span("req2"):
+                started.set()
+                await task
+
+        asyncio.run(main())
+
+        traces = {trace[0].name: trace for trace in exporter.traces}
+        assert set(traces) == {"req1", "req2", "late-child"}
+        assert [s.name for s in traces["req2"]] == ["req2"]
+        assert traces["late-child"][0].parent_id is None
+        assert len({trace[0].trace_id for trace in exporter.traces}) == 3
+
+    def test_threads(self, exporter: InMemorySpanExporter) -> None:
+        def work() -> None:
+            with span("work"):
+                pass
+
+        with span("main"):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        assert sorted(trace[0].name for trace in exporter.traces) == ["main", "work"]
+
+    def test_json_lines_exporter(self, tmp_path: Path) -> None:
+        file = tmp_path / "spans.jsonl"
+        previous = set_span_exporter(JSONLinesSpanExporter(file))
+
+        try:
+            with span("outer"):
+                with span("inner"):
+                    pass
+        finally:
+            set_span_exporter(previous)
+
+        spans = [json.loads(line) for line in file.read_text().splitlines()]
+        assert [(s["name"], s["parent_id"]) for s in spans] == [
+            ("outer", None),
+            ("inner", 0),
+        ]
+
+
+class TestPool:
+    """Unit tests for `Pool`"""
+
+    def test_reuse_and_laziness(self) -> None:
+        created = []
+        pool = Pool(lambda: created.append(object()) or created[-1], max_size=2)
+
+        assert created == []
+        with pool.acquire() as a:
+            pass
+        with pool.acquire() as b:
+            assert b is a
+            with pool.acquire() as c:
+                assert c is not a
+
+        stats = pool.stats()
+        assert (stats.size, stats.idle, stats.in_use) == (2, 2, 0)
+        assert (stats.created, stats.acquisitions, stats.waits) == (2, 3, 0)
+
+    def test_max_size_and_fifo_handoff(self) -> None:
+        pool = Pool(object, max_size=2)
+        order = []
+
+        def work(i: int) -> None:
+            with pool.acquire():
+                order.append(i)
+                time.sleep(0.05)
+
+        with ThreadPoolExecutor(6) as executor:
+            for i in range(6):
+                executor.submit(work, i)
+                time.sleep(0.005)
+
+        stats = pool.stats()
+        assert order == list(range(6))
+        assert stats.created == 2
+        assert stats.waits >= 3 and stats.max_wait > 0
+        assert 0 < stats.utilization <= 1
+
+    def test_timeout(self) -> None:
+        pool = Pool(object, max_size=1)
+
+        with pool.acquire():
+            with pytest.raises(TimeoutError):
+                with pool.acquire(timeout=0.05):
+                    pass
+
+        # The timed out waiter doesn't swallow the object
+        with pool.acquire(timeout=0):
+            pass
+
+    def test_health_check(self) -> None:
+        destroyed = []
+        pool = Pool(list, check=lambda obj: not obj, destroy=destroyed.append)
+
+        with pool.acquire() as obj:
+            obj.append("broken")
+        with pool.acquire() as obj:
+            assert obj == []
+
+        assert destroyed == [["broken"]]
+        assert pool.stats().created == 2
+
+    def test_idle_eviction(self) -> None:
+        now = 0.0
+        destroyed = []
+        pool = Pool(
+            object,
+            min_size=1,
+            max_idle=10,
+            destroy=destroyed.append,
+            clock=lambda: now,
+        )
+
+        pool.fill()
+        assert pool.stats().idle == 1
+
+        with pool.acquire(), pool.acquire(), pool.acquire():
+            pass
+        now = 5
+        with pool.acquire() as recent:
+            pass
+
+        now = 12
+        pool.evict_idle()
+        # Only the objects idle for more than 10 seconds are evicted
+        assert len(destroyed) == 2 and recent not in destroyed
+        assert pool.stats().size == 1
+
+        now = 30
+        pool.evict_idle()
+        # The minimum size is kept
+        assert len(destroyed) == 2
+
+    def test_async(self) -> None:
+        pool = Pool(object, max_size=1)
+        holders = []
+
+        async def work(i: int) -> None:
+            async with pool.acquire() as obj:
+                holders.append((i, obj))
+                await asyncio.sleep(0.01)
+
+        async def main() -> None:
+            await asyncio.gather(*(work(i) for i in range(4)))
+
+            async with pool.acquire():
+                with pytest.raises(TimeoutError):
+                    async with pool.acquire(timeout=0.01):
+                        pass
+
+        asyncio.run(main())
+        assert [i for i, _ in holders] == [0, 1, 2, 3]
+        assert len({id(obj) for _, obj in holders}) == 1
+
+    def test_close(self) -> None:
+        destroyed = []
+
+        with Pool(object, destroy=destroyed.append) as pool:
+            with pool.acquire():
+                pass
+
+        assert len(destroyed) == 1
+        with pytest.raises(RuntimeError):
+            with pool.acquire():
+                pass
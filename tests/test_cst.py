@@ -1,6 +1,13 @@
 import libcst as cst
+import libcst.matchers as m
+import pytest
 
-from recipes.cst import contains_outdented_comment, transform_source
+from recipes.cst import (
+    contains_outdented_comment,
+    tokens_from_matcher,
+    transform_source,
+    transform_source_pipeline,
+)
 
 
 def test_contains_outdented_comment() -> None:
@@ -26,3 +33,92 @@ def test_transform_source() -> None:
             return updated_node.with_changes(value=new_integer)
 
     assert transform_source(IncrementIntegerLiteral(), source) == "a = 2\nb = 3\n"
+
+
+def test_tokens_from_matcher() -> None:
+
+    assert tokens_from_matcher(m.Name("foo")) == {"foo"}
+    assert tokens_from_matcher(m.Name(m.OneOf("foo", "bar"))) == {"foo", "bar"}
+    assert tokens_from_matcher(m.Name("foo") | m.Name("bar")) == {"foo", "bar"}
+
+    # Any required field is enough, and the smallest set is picked
+    matcher = m.Attribute(value=m.Name("os"), attr=m.Name("path") | m.Name("sep"))
+    assert tokens_from_matcher(matcher) == {"os"}
+
+    assert tokens_from_matcher(m.Name()) is None
+    assert tokens_from_matcher(m.Name("foo") | m.Name()) is None
+    assert tokens_from_matcher(m.Name(m.MatchIfTrue(str.isupper))) is None
+
+
+def test_transform_source_with_prefilter() -> None:
+
+    class RenameFoo(cst.CSTTransformer):
+        prefilter_tokens = ["foo"]
+
+        def __init__(self) -> None:
+            self.parsed = 0
+
+        def visit_Module(self, node: cst.Module) -> None:
+            self.parsed += 1
+
+        def leave_Name(
+            self, original_node: cst.Name, updated_node: cst.Name
+        ) -> cst.Name:
+            if updated_node.value == "foo":
+                return updated_node.with_changes(value="bar")
+            return updated_node
+
+    transformer = RenameFoo()
+
+    # Identifiers are matched as whole words
+    source = "food = 1\nprint(food)\n"
+    assert transform_source(transformer, source) == source
+    assert transformer.parsed == 0
+
+    source = "foo = 1\nprint(foo)\n"
+    assert transform_source(transformer, source) == "bar = 1\nprint(bar)\n"
+    assert transformer.parsed == 1
+
+
+class RenameName(cst.CSTTransformer):
+    def __init__(self, old: str, new: str) -> None:
+        self.old = old
+        self.new = new
+        self.prefilter_tokens = [old]
+
+    def leave_Name(
+        self, original_node: cst.Name, updated_node: cst.Name
+    ) -> cst.Name:
+        if updated_node.value == self.old:
+            return updated_node.with_changes(value=self.new)
+        return updated_node
+
+
+class RenameTopLevelFunctions(cst.CSTTransformer):
+    """Prefix the names of top-level functions, skipping the function bodies"""
+
+    def visit_FunctionDef(self, node: cst.FunctionDef) -> bool:
+        return False
+
+    def leave_FunctionDef(
+        self, original_node: cst.FunctionDef, updated_node: cst.FunctionDef
+    ) -> cst.FunctionDef:
+        name = updated_node.name.with_changes(value="_" + updated_node.name.value)
+        return updated_node.with_changes(name=name)
+
+
+@pytest.mark.parametrize("fuse", [False, True])
+def test_transform_source_pipeline(fuse: bool) -> None:
+
+    source = "def f():\n    def g():\n        return a\n    return b\n"
+    transformers = [
+        RenameName("a", "x"),
+        RenameName("b", "y"),
+        RenameTopLevelFunctions(),
+    ]
+    expected = "def _f():\n    def g():\n        return x\n    return y\n"
+    assert transform_source_pipeline(transformers, source, fuse=fuse) == expected
+
+    # Leading transformers ruled out by the prefilter are skipped
+    source = "c = 1\n"
+    assert transform_source_pipeline(transformers[:2], source, fuse=fuse) == source
@@ -0,0 +1,321 @@
+import asyncio
+import gc
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from recipes.functools import (
+    Cache,
+    Lazy,
+    force,
+    get_hooks,
+    hookable,
+    inject_post_hook,
+    inject_pre_hook,
+    lazy_acall,
+    lazy_call,
+    memoize,
+    memoize_method,
+    singleflight,
+)
+
+
+class TestCache:
+    """Unit tests for `Cache`"""
+
+    def test_lru(self) -> None:
+        cache = Cache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.info().evictions == 1
+
+    def test_lfu(self) -> None:
+        cache = Cache(2, policy="lfu")
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+        cache.put("c", 3)
+        cache.put("d", 4)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") is None
+        assert cache.get("d") == 4
+
+    def test_ttl(self) -> None:
+        now = 0.0
+        cache = Cache(ttl=10, timer=lambda: now)
+        cache.put("a", 1)
+
+        now = 5
+        assert cache.get("a") == 1
+        now = 10
+        assert cache.get("a") is None
+        assert cache.info().currsize == 0
+
+    def test_maxbytes(self) -> None:
+        cache = Cache(None, maxbytes=10, sizer=len)
+        cache.put("a", "12345")
+        cache.put("b", "12345")
+        cache.put("c", "1")
+        assert cache.get("a") is None
+        assert cache.info().currbytes == 6
+
+        cache.put("d", "12345678901")
+        assert cache.get("d") is None
+
+    def test_lock_free_hits(self) -> None:
+        cache = Cache(2)
+        cache.put("a", 1)
+
+        # Hits don't wait for the lock, and are accounted for later
+        with ThreadPoolExecutor(1) as executor, cache._lock:
+            future = executor.submit(lambda: [cache.get("a") for _ in range(100)])
+            assert future.result(timeout=1) == [1] * 100
+
+        assert cache.info().hits == 100
+
+        # Buffered hits are taken into account before evicting
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+    def test_unknown_policy(self) -> None:
+        with pytest.raises(ValueError, match="unknown eviction policy"):
+            Cache(policy="mru")  # type: ignore
+
+
+class TestMemoize:
+    """Unit tests for `memoize()` and `memoize_method()`"""
+
+    def test_memoize(self) -> None:
+        calls = []
+
+        @memoize
+        def square(x: int) -> int:
+            calls.append(x)
+            return x * x
+
+        assert square(2) == 4
+        assert square(2) == 4
+        assert square(x=2) == 4
+        assert calls == [2, 2]
+
+        info = square.cache_info()  # type: ignore
+        assert (info.hits, info.misses) == (1, 2)
+
+        square.cache_clear()  # type: ignore
+        assert square.cache_info().currsize == 0  # type: ignore
+
+    def test_typed(self) -> None:
+        @memoize(typed=True)
+        def identity(x: object) -> object:
+            return x
+
+        assert type(identity(1)) is int
+        assert type(identity(1.0)) is float
+
+    def test_memoize_method(self) -> None:
+        class A:
+            def __init__(self, base: int) -> None:
+                self.base = base
+
+            @memoize_method(maxsize=2)
+            def add(self, x: int) -> int:
+                return self.base + x
+
+        a, b = A(1), A(10)
+        assert a.add(1) == 2
+        assert b.add(1) == 11
+        assert a.add(1) == 2
+        assert a.add.cache_info().hits == 1  # type: ignore
+
+        ref = weakref.ref(a)
+        del a
+        gc.collect()
+        assert ref() is None
+
+
+class TestSingleflight:
+    """Unit tests for `singleflight()`"""
+
+    def test_coalescing(self) -> None:
+        calls = []
+        barrier = threading.Barrier(5)
+
+        @singleflight
+        def work(x: int) -> object:
+            calls.append(x)
+            time.sleep(0.1)
+            return object()
+
+        def worker() -> object:
+            barrier.wait()
+            return work(1)
+
+        with ThreadPoolExecutor(5) as executor:
+            results = list(executor.map(lambda _: worker(), range(5)))
+
+        assert calls == [1]
+        assert all(result is results[0] for result in results)
+
+        # The call after completion executes again
+        assert work(1) is not results[0]
+
+    def test_exception(self) -> None:
+        @singleflight
+        def fail() -> None:
+            time.sleep(0.1)
+            raise ValueError
+
+        with ThreadPoolExecutor(3) as executor:
+            futures = [executor.submit(fail) for _ in range(3)]
+
+        for future in futures:
+            assert isinstance(future.exception(), ValueError)
+
+    def test_retain(self) -> None:
+        @singleflight(retain=60)
+        def work() -> object:
+            return object()
+
+        assert work() is work()
+
+
+class TestHooks:
+    """Unit tests for `inject_pre_hook()`, `inject_post_hook()` and `hookable()`"""
+
+    def test_fused_injection(self) -> None:
+        events = []
+
+        def double(x: int) -> int:
+            events.append("call")
+            return x * 2
+
+        f = inject_pre_hook(lambda x: events.append("pre1"), double)
+        f = inject_post_hook(lambda r, x: r + 1, f)
+        g = inject_pre_hook(lambda x: events.append("pre2"), f)
+
+        assert g(3) == 7
+        assert events == ["pre2", "pre1", "call"]
+        assert g.__wrapped__ is double  # type: ignore
+
+        # Injection doesn't affect the original hooked function
+        events.clear()
+        assert f(3) == 7
+        assert events == ["pre1", "call"]
+
+    def test_runtime_modification(self) -> None:
+        events = []
+
+        def hook(x: int) -> None:
+            events.append(x)
+
+        f = hookable(lambda x: x)
+        hooks = get_hooks(f)
+
+        hooks.add_pre_hook(hook)
+        assert f(1) == 1
+        hooks.disable()
+        assert f(2) == 2
+        hooks.enable()
+        hooks.remove_pre_hook(hook)
+        assert f(3) == 3
+        assert events == [1]
+
+        with pytest.raises(ValueError, match="not a hookable function"):
+            get_hooks(len)
+
+    def test_signature_forwarding(self) -> None:
+        calls = []
+
+        def f(a: int, /, b: int, c: int = 3, *args: int, d: int, **kwargs: int) -> int:
+            return a + b + c + sum(args) + d + sum(kwargs.values())
+
+        g = hookable(f)
+        get_hooks(g).add_pre_hook(lambda *args, **kwargs: calls.append((args, kwargs)))
+
+        assert g(1, b=2, d=4, e=5) == 15
+        assert g(1, 2, 3, 4, d=5) == 15
+        assert calls == [((1, 2, 3), {"d": 4, "e": 5}), ((1, 2, 3, 4), {"d": 5})]
+
+        with pytest.raises(TypeError):
+            g(1, 2)
+
+        # Builtin functions
+        assert inject_post_hook(lambda r, *args: r + 1, len)([1, 2]) == 3
+
+
+class TestLazy:
+    """Unit tests for `Lazy`, `lazy_call()`, `lazy_acall()` and `force()`"""
+
+    def test_exactly_once(self) -> None:
+        calls = []
+
+        def compute() -> object:
+            calls.append(None)
+            time.sleep(0.05)
+            return object()
+
+        lazy = Lazy(compute)
+        assert not lazy.evaluated
+
+        with ThreadPoolExecutor(5) as executor:
+            results = list(executor.map(lambda _: lazy.get(), range(5)))
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert lazy.evaluated
+
+    def test_retry_after_exception(self) -> None:
+        attempts = iter([ValueError(), 42])
+
+        def compute() -> int:
+            result = next(attempts)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        lazy = Lazy(compute)
+        with pytest.raises(ValueError):
+            lazy.get()
+        assert lazy.get() == 42
+
+    def test_force(self) -> None:
+        proxy = lazy_call(dict, a=1)
+        assert proxy["a"] == 1
+        assert type(force(proxy)) is dict
+        assert force(Lazy(list)) == []
+        assert force(1) == 1
+
+    def test_lazy_acall(self) -> None:
+        calls = []
+
+        async def compute(x: int) -> object:
+            calls.append(x)
+            await asyncio.sleep(0.01)
+            return object()
+
+        async def main() -> None:
+            lazy = lazy_acall(compute, 1)
+            assert not calls
+
+            first, second = await asyncio.gather(lazy, lazy)
+            assert first is second
+            assert await lazy is first
+            assert calls == [1]
+
+        asyncio.run(main())
@@ -0,0 +1,84 @@
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+from recipes.importlib import lazy_import_module
+
+
+@pytest.fixture
+def module_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """A directory on `sys.path` whose modules are removed from `sys.modules` at exit"""
+
+    monkeypatch.syspath_prepend(tmp_path)
+    orig_modules = set(sys.modules)
+
+    yield tmp_path
+
+    for name in set(sys.modules) - orig_modules:
+        del sys.modules[name]
+
+
+class TestLazyImportModule:
+    """Unit tests for `lazy_import_module()`"""
+
+    def test_laziness(self, module_dir: Path) -> None:
+        (module_dir / "executed.py").write_text("count = 0\n")
+        (module_dir / "lazy_mod.py").write_text(
+            "import executed\nexecuted.count += 1\nvalue = 42\n"
+        )
+
+        import executed
+
+        module = lazy_import_module("lazy_mod")
+        assert sys.modules["lazy_mod"] is module
+        assert isinstance(module, ModuleType)
+        assert executed.count == 0
+
+        assert module.value == 42
+        assert executed.count == 1
+        assert type(module) is ModuleType
+
+        assert lazy_import_module("lazy_mod") is module
+        assert executed.count == 1
+
+    def test_submodule(self, module_dir: Path) -> None:
+        (module_dir / "lazy_pkg").mkdir()
+        (module_dir / "lazy_pkg" / "__init__.py").write_text("")
+        (module_dir / "lazy_pkg" / "sub.py").write_text("value = 42\n")
+
+        module = lazy_import_module(".sub", "lazy_pkg")
+
+        import lazy_pkg
+
+        assert lazy_pkg.sub is module
+        assert module.value == 42
+
+    def test_module_not_found(self) -> None:
+        with pytest.raises(ModuleNotFoundError):
+            lazy_import_module("no_such_module_for_sure")
+
+
+def test_lazy_import_from(module_dir: Path) -> None:
+    (module_dir / "heavy.py").write_text("loaded = True\ndef f(): return 1\ng = 2\n")
+    (module_dir / "light.py").write_text(
+        "from recipes.importlib import lazy_import_from\n"
+        "__getattr__ = lazy_import_from('heavy', 'f')\n"
+        "__getattr__ = lazy_import_from('heavy', 'g')\n"
+    )
+
+    import light
+
+    assert "heavy" not in sys.modules
+
+    from light import f
+
+    assert "heavy" in sys.modules
+    assert f() == 1
+    assert light.g == 2
+    assert "f" in vars(light)
+
+    with pytest.raises(AttributeError):
+        light.h
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+
+import pytest
+
+
+# Third-party dependencies that are slow to import, and hence should only be imported
+# on demand.
+HEAVY_DEPENDENCIES = {
+    "click",
+    "inflect",
+    "libcst",
+    "lazy_object_proxy",
+    "more_itertools",
+    "pathspec",
+    "colorama",
+}
+
+# Generous enough to tolerate noise, while still catching the regression of eagerly
+# importing a heavy dependency, which used to cost seconds.
+IMPORT_TIME_BUDGET_US = 200_000
+
+MODULES = [
+    "recipes.asyncio",
+    "recipes.builtins",
+    "recipes.contextlib",
+    "recipes.functools",
+    "recipes.importlib",
+    "recipes.inspect",
+    "recipes.misc",
+    "recipes.monkeypatch",
+    "recipes.monoids",
+    "recipes.os",
+    "recipes.sourcelib",
+    "recipes.sys",
+]
+
+
+def measure_import_time(module: str) -> dict[str, int]:
+    """
+    Import the module in a fresh interpreter, and return the cumulative import time in
+    microseconds of every module imported along the way.
+    """
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+
+    # Each line looks like "import time:       self |  cumulative |   package"
+    for line in proc.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+
+    return times
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_time(module: str) -> None:
+
+    times = measure_import_time(module)
+
+    assert not HEAVY_DEPENDENCIES & times.keys()
+    assert times[module] <= IMPORT_TIME_BUDGET_US
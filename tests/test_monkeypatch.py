@@ -0,0 +1,196 @@
+import asyncio
+import threading
+import types
+
+import pytest
+
+from recipes import monkeypatch as mp
+
+
+class TestLocalSetattr:
+    """Unit tests for `local_setattr()`"""
+
+    def test_class_method(self) -> None:
+        class A:
+            def f(self) -> int:
+                return 1
+
+        a = A()
+        original = A.__dict__["f"]
+
+        with mp.local_setattr(A, "f", lambda self: 2):
+            assert a.f() == 2
+            assert A().f() == 2
+        assert a.f() == 1
+        assert A.__dict__["f"] is original
+
+    def test_class_constant_and_inherited(self) -> None:
+        class A:
+            x = 1
+
+        class B(A):
+            pass
+
+        with mp.local_setattr(B, "x", 2):
+            assert B.x == 2
+            assert A.x == 1
+        assert B.x == 1
+        assert "x" not in vars(B)
+
+    def test_class_staticmethod(self) -> None:
+        class A:
+            @staticmethod
+            def f() -> int:
+                return 1
+
+        with mp.local_setattr(A, "f", staticmethod(lambda: 2)):
+            assert A().f() == 2
+        assert A().f() == 1
+
+    def test_module_function(self) -> None:
+        module = types.ModuleType("module")
+        exec("def f(): return 1\ndef g(): return f()", vars(module))
+
+        with mp.local_setattr(module, "f", lambda: 2):
+            assert module.f() == 2
+            # Calls from within the module are patched too
+            assert module.g() == 2
+        assert module.g() == 1
+
+    def test_non_callable_on_module(self) -> None:
+        module = types.ModuleType("module")
+        module.x = 1
+
+        with pytest.raises(TypeError):
+            with mp.local_setattr(module, "x", 2):
+                pass
+        assert module.x == 1
+
+    def test_threads_are_isolated(self) -> None:
+        class A:
+            x = 0
+
+        barrier = threading.Barrier(4)
+        seen: dict[int, int] = {}
+
+        def worker(i: int) -> None:
+            with mp.local_setattr(A, "x", i):
+                barrier.wait()
+                seen[i] = A.x
+                barrier.wait()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert seen == {i: i for i in range(1, 5)}
+        assert A.x == 0
+        assert "x" in vars(A) and A.__dict__["x"] == 0
+
+    def test_tasks_are_isolated(self) -> None:
+        module = types.ModuleType("module")
+        exec("def f(): return 0", vars(module))
+
+        async def worker(i: int) -> int:
+            with mp.local_setattr(module, "f", lambda: i):
+                await asyncio.sleep(0)
+                return module.f()
+
+        async def main() -> list[int]:
+            return await asyncio.gather(*(worker(i) for i in range(1, 5)))
+
+        assert asyncio.run(main()) == [1, 2, 3, 4]
+        assert module.f() == 0
+
+    def test_local_mapattrs(self) -> None:
+        class A:
+            def f(self) -> int:
+                return 1
+
+            def g(self) -> int:
+                return 2
+
+        def double(method):
+            return lambda self: 2 * method(self)
+
+        with mp.local_mapattrs(double, A, ["f", "g"]):
+            assert (A().f(), A().g()) == (2, 4)
+        assert (A().f(), A().g()) == (1, 2)
+
+
+class TestInstrument:
+    """Unit tests for `instrument()`"""
+
+    def test_class(self) -> None:
+        class A:
+            def outer(self) -> int:
+                return self.inner() + self.helper()
+
+            def inner(self) -> int:
+                return 1
+
+            @staticmethod
+            def helper() -> int:
+                return 2
+
+            @classmethod
+            def create(cls) -> "A":
+                return cls()
+
+            def __repr__(self) -> str:
+                return "A()"
+
+        raw = dict(vars(A))
+        prefix = f"{A.__module__}.{A.__qualname__}"
+
+        with mp.instrument(A) as report:
+            a = A.create()
+            for _ in range(3):
+                assert a.outer() == 3
+            assert A.helper() == 2
+            repr(a)
+
+        assert dict(vars(A)) == raw
+
+        snapshot = report.snapshot()
+        assert set(snapshot) == {
+            f"{prefix}.{attr}" for attr in ["outer", "inner", "helper", "create"]
+        }
+        assert snapshot[f"{prefix}.outer"]["calls"] == 3
+        assert snapshot[f"{prefix}.inner"]["calls"] == 3
+        assert snapshot[f"{prefix}.helper"]["calls"] == 4
+        assert snapshot[f"{prefix}.create"]["calls"] == 1
+
+        outer = snapshot[f"{prefix}.outer"]
+        assert outer["self_ns"] <= outer["total_ns"]
+        assert outer["p50_ns"] <= outer["p99_ns"]
+
+        # The self time of a caller excludes the time of its instrumented callees
+        inner = snapshot[f"{prefix}.inner"]
+        assert outer["total_ns"] >= outer["self_ns"] + inner["total_ns"]
+
+    def test_module_and_pattern(self) -> None:
+        module = types.ModuleType("module")
+        exec(
+            "from os.path import join\n"
+            "def load(): return parse()\n"
+            "def parse(): return 1\n"
+            "async def fetch(): return parse()\n",
+            vars(module),
+        )
+        original = module.parse
+
+        with mp.instrument(module, "[pf]*") as report:
+            assert module.load() == 1
+            assert asyncio.run(module.fetch()) == 1
+
+        assert module.parse is original
+        assert set(report.snapshot()) == {"module.parse", "module.fetch"}
+        assert report.snapshot()["module.parse"]["calls"] == 2
+
+    def test_invalid_target(self) -> None:
+        with pytest.raises(TypeError):
+            with mp.instrument(object()):  # type: ignore
+                pass
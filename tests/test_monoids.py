@@ -0,0 +1,195 @@
+import asyncio
+import operator
+from functools import reduce
+from math import inf
+
+import pytest
+from hypothesis import given, strategies as st
+
+from recipes.functools import mapreduce
+from recipes.monoids import (
+    BoolAnd,
+    FenwickTree,
+    Max,
+    Min,
+    Monoid,
+    SegmentTree,
+    SlidingWindow,
+    Sum,
+    TimeWindow,
+    bounded_max,
+    bounded_min,
+    product_monoid,
+    record_monoid,
+)
+
+
+StrConcat = Monoid("", operator.add)
+
+
+class TestSegmentTree:
+    """Unit tests for `SegmentTree`"""
+
+    @given(st.lists(st.text(max_size=2)), st.integers(), st.integers())
+    def test_query_non_commutative(self, xs: list[str], start: int, stop: int) -> None:
+        tree = SegmentTree(StrConcat, xs)
+        assert tree.query(start, stop) == "".join(xs[start:stop])
+
+    @given(
+        st.lists(st.integers(), min_size=1),
+        st.lists(st.tuples(st.integers(), st.integers())),
+    )
+    def test_point_update(self, xs: list[int], updates: list[tuple[int, int]]) -> None:
+        tree = SegmentTree(Max, xs)
+
+        for index, value in updates:
+            index %= len(xs)
+            xs[index] = value
+            tree[index] = value
+
+        assert list(tree) == xs
+        assert tree.query() == max(xs)
+
+    def test_compact_storage(self) -> None:
+        tree = SegmentTree(Sum, [1, 2, 3, 4], typecode="q")
+        tree[-1] = 10
+        assert tree.query(1, 4) == 15
+
+        with pytest.raises(IndexError):
+            tree[4] = 0
+
+    def test_compact_storage_identity(self) -> None:
+        # The infinite identities of Min and Max can't be stored in integer arrays
+        with pytest.raises(ValueError, match="bounded_min"):
+            SegmentTree(Min, [3, 1, 2], typecode="q")
+        with pytest.raises(ValueError):
+            SegmentTree(Max, [], typecode="q")
+        with pytest.raises(ValueError):
+            SegmentTree(bounded_min(2**64), [1], typecode="q")
+
+        tree = SegmentTree(bounded_min(2**63 - 1), [3, 1, 2], typecode="q")
+        assert tree.query(0, 2) == 1
+        assert tree.query(2, 2) == 2**63 - 1
+
+        tree = SegmentTree(bounded_max(-(2**63)), [1, 2], typecode="q")
+        assert tree.query() == 2
+
+
+class TestFenwickTree:
+    """Unit tests for `FenwickTree`"""
+
+    @given(
+        st.lists(st.integers()),
+        st.lists(st.tuples(st.integers(), st.integers())),
+        st.integers(),
+        st.integers(),
+    )
+    def test_query(
+        self, xs: list[int], updates: list[tuple[int, int]], start: int, stop: int
+    ) -> None:
+        tree = FenwickTree(Sum, xs)
+
+        for index, value in updates:
+            if not xs:
+                break
+            index %= len(xs)
+            xs[index] = value
+            tree[index] = value
+
+        assert list(tree) == xs
+        assert tree.query(start, stop) == sum(xs[start:stop])
+
+    def test_compact_storage(self) -> None:
+        tree = FenwickTree(Sum, [1.5, 2.5, 3.5], typecode="d")
+        tree.add(0, 1.0)
+        assert tree.prefix(2) == 5.0
+        assert tree.query(-2) == 6.0
+
+
+class TestSlidingWindow:
+    """Unit tests for `SlidingWindow`"""
+
+    @given(st.lists(st.text(max_size=2)), st.integers(min_value=1, max_value=5))
+    def test_count_based(self, xs: list[str], maxlen: int) -> None:
+        window = SlidingWindow(StrConcat, maxlen)
+
+        for i, x in enumerate(xs):
+            window.append(x)
+            assert window.query() == "".join(xs[max(0, i + 1 - maxlen) : i + 1])
+
+    def test_popleft(self) -> None:
+        window = SlidingWindow(Sum)
+
+        with pytest.raises(IndexError):
+            window.popleft()
+
+        window.append(1)
+        window.append(2)
+        window.popleft()
+        window.append(3)
+        assert window.query() == 5
+        assert len(window) == 2
+
+
+def test_time_window() -> None:
+    window = TimeWindow(Sum, duration=10)
+
+    window.append(1, timestamp=0)
+    window.append(2, timestamp=5)
+    window.append(3, timestamp=10)
+    assert window.query(now=10) == 5
+    assert window.query(now=15) == 3
+    assert window.query(now=20) == 0
+    assert len(window) == 0
+
+
+class TestProductMonoid:
+    """Unit tests for `product_monoid()` and `record_monoid()`"""
+
+    @given(st.lists(st.integers()))
+    def test_product_monoid(self, xs: list[int]) -> None:
+        stats = product_monoid(Sum, Max, BoolAnd, StrConcat)
+        elems = [(x, x, x > 0, str(x)) for x in xs]
+
+        expected = (
+            sum(xs),
+            max(xs, default=-inf),
+            all(x > 0 for x in xs),
+            "".join(map(str, xs)),
+        )
+        assert stats.mconcat(elems) == expected
+        assert reduce(stats.mappend, elems, stats.mempty) == expected
+
+    def test_record_monoid(self) -> None:
+        stats = record_monoid("Stats", count=Sum, low=Min, high=Max)
+        Stats = type(stats.mempty)
+
+        result = stats.mconcat(Stats(1, x, x) for x in [3, 1, 2])
+        assert result == Stats(count=3, low=1, high=3)
+        assert stats.mappend(result, Stats(1, 0, 0)).low == 0
+
+    def test_mapreduce(self) -> None:
+        stats = product_monoid(Sum, Max)
+
+        @mapreduce(stats)
+        def f(x: int) -> tuple[int, int]:
+            return 1, x
+
+        @mapreduce(stats)
+        async def g(x: int) -> tuple[int, int]:
+            return 1, x
+
+        assert f(3, 1, 2) == (3, 3)
+        assert asyncio.run(g(3, 1, 2)) == (3, 3)
+
+    def test_sliding_window(self) -> None:
+        window = SlidingWindow(product_monoid(Sum, Min), maxlen=2)
+
+        for x in [3, 1, 2]:
+            window.append((x, x))
+
+        assert window.query() == (3, 1)
+
+    def test_no_monoid(self) -> None:
+        with pytest.raises(ValueError):
+            product_monoid()
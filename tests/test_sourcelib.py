@@ -1,7 +1,9 @@
+from pathlib import Path
+
 import pytest
 
 from recipes.exceptions import OutdentedCommentError
-from recipes.sourcelib import unindent_source
+from recipes.sourcelib import transform_files, unindent_source
 
 
 class TestUnindentSource:
@@ -61,3 +63,57 @@ class TestUnindentSource:
         assert unindent_source(source) == "a = 1\n    \r\nb = 2\n"
         source = "    a = 1\n  \r\n    b = 2\n"
         assert unindent_source(source) == "a = 1\n  \r\nb = 2\n"
+
+
+def rename_foo(source: str) -> str:
+    if "syntax error" in source:
+        raise SyntaxError("invalid syntax")
+    return source.replace("foo", "bar")
+
+
+class TestTransformFiles:
+    """Unit tests for `transform_files()`"""
+
+    @pytest.mark.parametrize("max_workers", [1, 2])
+    def test_transform(self, tmp_path: Path, max_workers: int) -> None:
+        files = {
+            "changed.py": "foo = 1\r\nprint(foo)\r\n",
+            "unchanged.py": "baz = 1\n",
+            "failed.py": "syntax error\n",
+        }
+        for name, source in files.items():
+            (tmp_path / name).write_bytes(source.encode())
+
+        paths = [tmp_path / name for name in files]
+        report = transform_files(paths, rename_foo, max_workers=max_workers)
+
+        assert report.changed == [str(tmp_path / "changed.py")]
+        assert report.unchanged == [str(tmp_path / "unchanged.py")]
+        assert report.skipped == []
+        assert list(report.failed.values()) == ["SyntaxError: invalid syntax"]
+
+        # Line endings are preserved
+        assert (tmp_path / "changed.py").read_bytes() == b"bar = 1\r\nprint(bar)\r\n"
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted(files)
+
+    def test_cache(self, tmp_path: Path) -> None:
+        cache_file = tmp_path / "cache.json"
+        paths = [tmp_path / f"{i}.py" for i in range(3)]
+        for path in paths:
+            path.write_text("foo\n")
+
+        def run(version: str = "1"):
+            return transform_files(
+                paths, rename_foo, version=version, cache_file=cache_file, max_workers=1
+            )
+
+        assert len(run().changed) == 3
+        assert len(run().skipped) == 3
+
+        paths[0].write_text("foo again\n")
+        report = run()
+        assert report.changed == [str(paths[0])]
+        assert len(report.skipped) == 2
+
+        # A new version of the transformation invalidates the cache
+        assert len(run(version="2").unchanged) == 3